@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify
 from flask_cors import CORS
 import json
 import os
@@ -8,9 +8,27 @@ import cv2
 import numpy as np
 from PIL import Image
 import base64
+import bisect
+import hashlib
 import io
 import re
 import logging
+import time
+import threading
+import queue
+import uuid
+import functools
+import contextlib
+import sqlite3
+import sys
+import atexit
+from collections import ChainMap, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React Native
@@ -19,137 +37,2028 @@ CORS(app)  # Enable CORS for React Native
 DATA_FILE = 'inventory_data.json'
 RETENTION_DAYS = 30
 
+# Storage backend: 'json' rewrites DATA_FILE on every change, 'journal'
+# appends changes to DATA_FILE.journal and compacts it in the background,
+# 'sqlite' keeps items in SQLITE_FILE and 'partitioned' keeps one file per
+# date in PARTITION_DIR; both load days on demand and keep DAY_CACHE_SIZE
+# recently used days in memory
+STORAGE_BACKEND = os.environ.get('INVENTORY_STORAGE', 'json')
+SQLITE_FILE = os.environ.get('INVENTORY_SQLITE_FILE', 'inventory_data.db')
+PARTITION_DIR = os.environ.get('INVENTORY_PARTITION_DIR', 'inventory_data')
+DAY_CACHE_SIZE = int(os.environ.get('DAY_CACHE_SIZE', 7))
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 5000))
+# Date-range queries: items per page (and per chunk when streaming NDJSON)
+QUERY_PAGE_SIZE = int(os.environ.get('QUERY_PAGE_SIZE', 500))
+QUERY_MAX_PAGE_SIZE = int(os.environ.get('QUERY_MAX_PAGE_SIZE', 5000))
+# Changes kept per day for /api/items/<date>/changes, and serialized day
+# responses kept for conditional GETs
+CHANGE_LOG_SIZE = int(os.environ.get('CHANGE_LOG_SIZE', 500))
+ITEMS_BODY_CACHE_SIZE = int(os.environ.get('ITEMS_BODY_CACHE_SIZE', 32))
+# Days past RETENTION_DAYS move to one compressed columnar file per month in
+# ARCHIVE_DIR (ARCHIVE_ENABLED=0 deletes them instead); /api/analytics reads
+# both the archive and the retained days. ARCHIVE_CACHE_MONTHS decoded months
+# stay in memory
+ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', '1') == '1'
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'inventory_archive')
+ARCHIVE_CACHE_MONTHS = int(os.environ.get('ARCHIVE_CACHE_MONTHS', 24))
+ANALYTICS_TOP_ITEMS = int(os.environ.get('ANALYTICS_TOP_ITEMS', 10))
+# Seconds between background retention runs (0 disables the job)
+RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', 3600))
+JOURNAL_FSYNC_INTERVAL = float(os.environ.get('JOURNAL_FSYNC_INTERVAL', 1.0))
+JOURNAL_COMPACT_RECORDS = int(os.environ.get('JOURNAL_COMPACT_RECORDS', 1000))
+# Only one process may serve a data store: the inventory lives in memory, so
+# a second writer would overwrite the first one's changes. Scale with threads.
+PROCESS_LOCK = os.environ.get('INVENTORY_PROCESS_LOCK', '1') == '1'
+
+# Production server (python InventoryManager.py serve): one process, many threads
+SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', 5001))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))
+
+# OCR execution: 'thread' or 'process' pool, shared by every scan. The pool
+# size is the global cap on concurrent Tesseract processes.
+OCR_EXECUTOR = os.environ.get('OCR_EXECUTOR', 'thread')
+OCR_MAX_WORKERS = int(os.environ.get('OCR_MAX_WORKERS', os.cpu_count() or 2))
+OCR_SCAN_DEADLINE = float(os.environ.get('OCR_SCAN_DEADLINE', 30))
+# Each Tesseract process would otherwise start an OpenMP thread per core on
+# top of the pool's own parallelism. Only Tesseract's environment gets the
+# limit (an explicit OMP_THREAD_LIMIT still wins); the server process, and
+# torch under EasyOCR, keep theirs
+pytesseract.pytesseract.environ = ChainMap(os.environ, {'OMP_THREAD_LIMIT': '1'})
+
+# OCR search: 'exhaustive' tries the whole grid, 'adaptive' tries combinations
+# in order of past wins and stops at OCR_CONFIDENCE_THRESHOLD, 'layout' runs
+# one word-box pass (OCR_LAYOUT_CONFIG) per variant and reads labelled fields
+OCR_SEARCH_MODE = os.environ.get('OCR_SEARCH_MODE', 'exhaustive')
+OCR_LAYOUT_CONFIG = os.environ.get('OCR_LAYOUT_CONFIG', '--psm 11 --oem 3')
+# Layout confidences weigh Tesseract's word confidence in, so they rarely reach 100
+OCR_LAYOUT_THRESHOLD = int(os.environ.get('OCR_LAYOUT_THRESHOLD', 80))
+# Myanmar configs are skipped when OSD finds another script with at least this confidence
+OCR_SCRIPT_CONFIDENCE = float(os.environ.get('OCR_SCRIPT_CONFIDENCE', 1.0))
+
+# OCR engine per scan: 'tesseract', 'easyocr' or 'vote' (both, merged per field).
+# The EasyOCR model is loaded at startup when it may be the default, otherwise
+# on first use.
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'tesseract')
+EASYOCR_LANGUAGES = os.environ.get('EASYOCR_LANGUAGES', 'en').split(',')
+EASYOCR_PRELOAD = os.environ.get('EASYOCR_PRELOAD', '0' if OCR_ENGINE == 'tesseract' else '1') == '1'
+OCR_CONFIDENCE_THRESHOLD = int(os.environ.get('OCR_CONFIDENCE_THRESHOLD', 100))
+# Combinations kept in flight by searches that can stop early (adaptive,
+# layout); anything running when the threshold is met is wasted work
+OCR_EARLY_EXIT_PARALLELISM = int(os.environ.get('OCR_EARLY_EXIT_PARALLELISM', 2))
+OCR_STATS_FILE = os.environ.get('OCR_STATS_FILE', 'ocr_stats.json')
+# Seconds between writes of changed win counts to OCR_STATS_FILE
+OCR_STATS_FLUSH_INTERVAL = float(os.environ.get('OCR_STATS_FLUSH_INTERVAL', 5))
+
+# Receipt mode OCRs each detected text line as a single line of text
+RECEIPT_LINE_CONFIG = os.environ.get('RECEIPT_LINE_CONFIG', '--psm 7 --oem 3')
+
+# Uploaded photos are decoded/downscaled so the longer side is at most this
+# many pixels (0 keeps full resolution)
+OCR_MAX_IMAGE_SIDE = int(os.environ.get('OCR_MAX_IMAGE_SIDE', 2000))
+# Crop preprocessing to the detected label/receipt area before OCR
+OCR_TEXT_CROP = os.environ.get('OCR_TEXT_CROP', '1') == '1'
+
+# OCR result cache: in-memory LRU of OCR_CACHE_SIZE scans over OCR_CACHE_FILE.
+# OCR_CACHE_PHASH_DISTANCE >= 0 also matches near-identical rescans.
+OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', '1') == '1'
+OCR_CACHE_FILE = os.environ.get('OCR_CACHE_FILE', 'ocr_cache.db')
+OCR_CACHE_SIZE = int(os.environ.get('OCR_CACHE_SIZE', 256))
+OCR_CACHE_TTL = float(os.environ.get('OCR_CACHE_TTL', 24 * 3600))
+OCR_CACHE_PHASH_DISTANCE = int(os.environ.get('OCR_CACHE_PHASH_DISTANCE', -1))
+
+# Async OCR jobs: OCR_JOB_WORKERS threads serve a queue of at most
+# OCR_JOB_QUEUE_SIZE scans; finished jobs are kept for OCR_JOB_TTL seconds
+OCR_JOB_WORKERS = int(os.environ.get('OCR_JOB_WORKERS', 2))
+OCR_JOB_QUEUE_SIZE = int(os.environ.get('OCR_JOB_QUEUE_SIZE', 32))
+OCR_JOB_TTL = float(os.environ.get('OCR_JOB_TTL', 600))
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class Metrics:
+    """In-process counters, latency histograms and gauges for /api/metrics.
+    
+    Recording is a dict update under one lock; text in the Prometheus
+    exposition format is only built when /api/metrics is scraped.
+    """
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+    
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+    
+    def gauge(self, name, help_text, fn):
+        """Register a gauge whose value is read from fn() at scrape time"""
+        self.describe(name, 'gauge', help_text)
+        self._gauges[name] = fn
+    
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                histogram = self._histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+    
+    def timed(self, name, **labels):
+        """Decorator observing the wrapped function's run time"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorator
+    
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = []
+        for key, value in pairs:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+    
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(self.BUCKETS + ('+Inf',), buckets):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for name, fn in self._gauges.items():
+            try:
+                samples[name] = [f"{name} {fn()}"]
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {e}")
+        
+        output = []
+        for name in sorted(samples):
+            kind, help_text = self._help.get(name, ('untyped', ''))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'HTTP requests by route, method and status')
+metrics.describe('http_request_errors_total', 'counter', 'HTTP requests answered with a 5xx status')
+metrics.describe('http_request_duration_seconds', 'histogram', 'HTTP request latency by route')
+metrics.describe('fallbacks_total', 'counter', 'Fallback paths taken, by route and kind')
+metrics.describe('image_decode_seconds', 'histogram', 'Uploaded image decode and downscale time')
+metrics.describe('preprocessing_seconds', 'histogram', 'Time to build each preprocessing stage')
+metrics.describe('tesseract_seconds', 'histogram', 'Time of a single Tesseract call by config')
+metrics.describe('easyocr_seconds', 'histogram', 'Time of one batched EasyOCR inference')
+metrics.describe('extract_text_seconds', 'histogram', 'Time of extract_numbers_and_text_from_text')
+metrics.describe('storage_seconds', 'histogram', 'Inventory load_data/save_data time')
+
+def current_route():
+    """URL rule of the request being served ('background' outside a request)"""
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return 'background'
+
+def write_json_atomic(path, obj, indent=None):
+    """Write JSON to a temporary file and swap it in, so a crash never truncates path"""
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+def file_size(path):
+    """Size of path in bytes (0 if it doesn't exist)"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def item_seq(item_id):
+    """Numeric part of an item id such as '2024-05-01_12' (-1 if it has none)"""
+    try:
+        return int(str(item_id).rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return -1
+
+def item_order(item_id):
+    """Sort key of an item id within its day: the counter, then the id itself"""
+    return item_seq(item_id), str(item_id)
+
+def item_amount(item):
+    """Sales amount of an item, 0 when missing or not a number"""
+    try:
+        return float(item.get('totalAmount') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def new_summary():
+    return {'next_id': 0, 'version': 0, 'item_count': 0, 'total_sales': 0.0, 'categories': {}}
+
+def account_item(summary, item, sign):
+    """Add (sign=1) or remove (sign=-1) an item from a day or global summary"""
+    amount = item_amount(item) * sign
+    summary['item_count'] += sign
+    summary['total_sales'] += amount
+    category = item.get('category') or 'other'
+    totals = summary['categories'].setdefault(category, {'item_count': 0, 'total_sales': 0.0})
+    totals['item_count'] += sign
+    totals['total_sales'] += amount
+    if totals['item_count'] <= 0:
+        del summary['categories'][category]
+    if summary['item_count'] <= 0:
+        # Don't let float rounding leave a residue on an empty summary
+        summary['total_sales'] = 0.0
+
+def account_summary(totals, summary, sign):
+    """Add or remove a whole day summary from the global totals"""
+    totals['item_count'] += summary['item_count'] * sign
+    totals['total_sales'] += summary['total_sales'] * sign
+    for category, day_totals in summary['categories'].items():
+        cat_totals = totals['categories'].setdefault(category, {'item_count': 0, 'total_sales': 0.0})
+        cat_totals['item_count'] += day_totals['item_count'] * sign
+        cat_totals['total_sales'] += day_totals['total_sales'] * sign
+        if cat_totals['item_count'] <= 0:
+            del totals['categories'][category]
+    if totals['item_count'] <= 0:
+        totals['total_sales'] = 0.0
+
+def build_day_summary(items, previous=None):
+    """Per-day id counter and aggregates for a list of items.
+    
+    Used when no summary (or one from an older version) was persisted; the id
+    counter never goes below the previous one.
+    """
+    summary = new_summary()
+    summary['next_id'] = max((item_seq(item.get('id')) for item in items), default=-1) + 1
+    if previous:
+        summary['next_id'] = max(summary['next_id'], previous.get('next_id', 0))
+        summary['version'] = previous.get('version', 0)
+    for item in items:
+        account_item(summary, item, 1)
+    return summary
+
+def renumber_duplicate_ids(date, items, summary=None):
+    """Give fresh ids to items repeating an earlier item's id; returns whether any changed.
+    
+    Ids used to come from len(items), so data written then can hold the same
+    id twice. New ids continue the day's counter (summary['next_id'] if kept).
+    """
+    seen = set()
+    duplicates = []
+    for item in items:
+        if item.get('id') in seen:
+            duplicates.append(item)
+        seen.add(item.get('id'))
+    if not duplicates:
+        return False
+    next_id = max((item_seq(item.get('id')) for item in items), default=-1) + 1
+    if is_current_summary(summary):
+        next_id = max(next_id, summary['next_id'])
+    for item in duplicates:
+        logger.warning(f"Renumbering duplicate item id {item.get('id')} to {date}_{next_id}")
+        item['id'] = f"{date}_{next_id}"
+        next_id += 1
+    if is_current_summary(summary):
+        summary['next_id'] = next_id
+    return True
+
+def is_current_summary(summary):
+    return summary is not None and 'item_count' in summary
+
+def replay_mutations(data, days, mutations):
+    """Apply journal records to plain {date: [items]} data and its day summaries.
+    
+    Records are idempotent (an add of an existing id replaces it), so a segment
+    replayed twice after an interrupted compaction leaves the same result.
+    """
+    positions = {}
+    
+    def index(date):
+        if date not in positions:
+            positions[date] = {item['id']: i for i, item in enumerate(data.get(date, []))}
+        return positions[date]
+    
+    for record in mutations:
+        op, date = record['op'], record['date']
+        if op in ('add', 'update'):
+            item = record['item']
+            pos = index(date)
+            items = data.setdefault(date, [])
+            summary = days.setdefault(date, new_summary())
+            if item['id'] in pos:
+                account_item(summary, items[pos[item['id']]], -1)
+                items[pos[item['id']]] = item
+                account_item(summary, item, 1)
+            elif op == 'add':
+                pos[item['id']] = len(items)
+                items.append(item)
+                account_item(summary, item, 1)
+            if op == 'add':
+                summary['next_id'] = max(summary['next_id'], item_seq(item['id']) + 1)
+            summary['version'] = max(summary.get('version', 0), record.get('version', 0))
+        elif op == 'delete':
+            pos = index(date)
+            if record['id'] in pos:
+                account_item(days[date], data[date][pos[record['id']]], -1)
+                data[date] = [item for item in data[date] if item['id'] != record['id']]
+                positions.pop(date)
+            if date in days:
+                days[date]['version'] = max(days[date].get('version', 0), record.get('version', 0))
+        elif op == 'drop':
+            data.pop(date, None)
+            days.pop(date, None)
+            positions.pop(date, None)
+    return data, days
+
+class JsonFileStorage:
+    """Keeps all data in one JSON file, rewritten on every save.
+    
+    Day summaries are stored under the reserved '_meta' key next to the dates.
+    """
+    def __init__(self, data_file, indent=2):
+        self.data_file = data_file
+        self.lock_file = f"{data_file}.lock"
+        self.indent = indent
+    
+    def load(self):
+        if os.path.exists(self.data_file):
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            meta = data.pop('_meta', {})
+            return data, meta.get('days', {})
+        return {}, {}
+    
+    def save(self, data, days, mutations):
+        write_json_atomic(self.data_file, {'_meta': {'days': days}, **data}, indent=self.indent)
+    
+    def size(self):
+        """Bytes on disk"""
+        return file_size(self.data_file)
+    
+    def close(self):
+        pass
+
+class JournalStorage:
+    """Appends each mutation to a journal next to a JSON snapshot.
+    
+    Journal lines are fsynced at most every JOURNAL_FSYNC_INTERVAL seconds.
+    Once the journal holds JOURNAL_COMPACT_RECORDS records it is rotated to a
+    segment file, and a background thread folds that segment into the snapshot.
+    The snapshot is a plain inventory_data.json, so existing files load as is.
+    """
+    def __init__(self, data_file, fsync_interval=None, compact_records=None):
+        self.snapshot = JsonFileStorage(data_file, indent=None)
+        self.lock_file = self.snapshot.lock_file
+        self.journal_file = f"{data_file}.journal"
+        self.segment_file = f"{data_file}.journal.compacting"
+        self.fsync_interval = JOURNAL_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self.compact_records = compact_records or JOURNAL_COMPACT_RECORDS
+        self._lock = threading.Lock()
+        self._journal = None
+        self._records = 0
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        self._compactor = None
+        self._closed = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_loop, name='journal-fsync', daemon=True)
+        self._syncer.start()
+    
+    @staticmethod
+    def _read_records(path):
+        records = []
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        logger.warning(f"Skipping unreadable journal record in {path}")
+        return records
+    
+    def load(self):
+        with self._lock:
+            # Finish a compaction that was interrupted before it could swap the snapshot
+            if os.path.exists(self.segment_file):
+                self._compact_segment()
+            data, days = self.snapshot.load()
+            records = self._read_records(self.journal_file)
+            self._records = len(records)
+            return replay_mutations(data, days, records)
+    
+    def save(self, data, days, mutations):
+        if not mutations:
+            return
+        lines = ''.join(json.dumps(m, ensure_ascii=False, separators=(',', ':')) + '\n'
+                        for m in mutations)
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            self._journal.write(lines)
+            self._journal.flush()
+            self._records += len(mutations)
+            self._dirty = True
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+            if self._records >= self.compact_records and self._compactor is None:
+                self._rotate()
+    
+    def _fsync(self):
+        os.fsync(self._journal.fileno())
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+    
+    def _sync_loop(self):
+        while not self._closed.wait(max(self.fsync_interval, 0.05)):
+            with self._lock:
+                if self._dirty and self._journal is not None:
+                    try:
+                        self._fsync()
+                    except Exception as e:
+                        logger.error(f"Error syncing journal: {e}")
+    
+    def _rotate(self):
+        """Move the current journal aside and compact it in the background (lock held)"""
+        self._fsync()
+        self._journal.close()
+        self._journal = None
+        os.replace(self.journal_file, self.segment_file)
+        self._records = 0
+        self._compactor = threading.Thread(target=self._run_compaction,
+                                           name='journal-compact', daemon=True)
+        self._compactor.start()
+    
+    def _run_compaction(self):
+        try:
+            self._compact_segment()
+        except Exception as e:
+            logger.error(f"Error compacting journal: {e}")
+        finally:
+            with self._lock:
+                self._compactor = None
+    
+    def _compact_segment(self):
+        """Fold the rotated segment into the snapshot, then drop the segment"""
+        data, days = self.snapshot.load()
+        data, days = replay_mutations(data, days, self._read_records(self.segment_file))
+        self.snapshot.save(data, days, [])
+        os.remove(self.segment_file)
+        logger.info("Compacted inventory journal into snapshot")
+    
+    def size(self):
+        return self.snapshot.size() + file_size(self.journal_file) + file_size(self.segment_file)
+    
+    def close(self):
+        self._closed.set()
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            if self._journal is not None:
+                self._fsync()
+                self._journal.close()
+                self._journal = None
+
+class SqliteStorage:
+    """Keeps items in a SQLite database (WAL mode), one row per item.
+    
+    Days are read on demand instead of at startup, and retention is a single
+    indexed DELETE. The full item dict is stored as JSON in `body`, next to the
+    columns needed for indexing and aggregation. Day summaries live in `days`.
+    """
+    lazy = True
+    
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.lock_file = f"{db_file}.lock"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS items (
+                date TEXT NOT NULL,
+                id TEXT NOT NULL,
+                category TEXT,
+                total_amount REAL NOT NULL DEFAULT 0,
+                body TEXT NOT NULL,
+                PRIMARY KEY (date, id)
+            )''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS days (
+                date TEXT PRIMARY KEY,
+                summary TEXT NOT NULL
+            )''')
+        self._conn.commit()
+    
+    def load(self):
+        with self._lock:
+            days = {date: json.loads(summary) for date, summary in
+                    self._conn.execute('SELECT date, summary FROM days')}
+            missing = [date for date, in self._conn.execute('SELECT DISTINCT date FROM items')
+                       if not is_current_summary(days.get(date))]
+        if missing:
+            # Databases written before day summaries existed or held aggregates
+            for date in missing:
+                days[date] = build_day_summary(self.load_day(date), days.get(date))
+            with self._lock, self._conn:
+                self._write_days(days, missing)
+        return {}, days
+    
+    def load_day(self, date):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT body FROM items WHERE date = ? ORDER BY rowid', (date,)).fetchall()
+        return [json.loads(body) for body, in rows]
+    
+    @staticmethod
+    def _row(date, item):
+        return (date, item['id'], item.get('category'), item.get('totalAmount') or 0,
+                json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+    
+    def _write_days(self, days, dates):
+        for date in dates:
+            if date in days:
+                self._conn.execute('INSERT OR REPLACE INTO days (date, summary) VALUES (?, ?)',
+                                   (date, json.dumps(days[date], ensure_ascii=False)))
+            else:
+                self._conn.execute('DELETE FROM days WHERE date = ?', (date,))
+    
+    def save(self, data, days, mutations):
+        with self._lock, self._conn:
+            for m in mutations:
+                if m['op'] == 'add':
+                    self._conn.execute(
+                        '''INSERT INTO items (date, id, category, total_amount, body)
+                           VALUES (?, ?, ?, ?, ?)
+                           ON CONFLICT (date, id) DO UPDATE SET category = excluded.category,
+                           total_amount = excluded.total_amount, body = excluded.body''',
+                        self._row(m['date'], m['item']))
+                elif m['op'] == 'update':
+                    date, item_id, category, total_amount, body = self._row(m['date'], m['item'])
+                    self._conn.execute(
+                        'UPDATE items SET category = ?, total_amount = ?, body = ? WHERE date = ? AND id = ?',
+                        (category, total_amount, body, date, item_id))
+                elif m['op'] == 'delete':
+                    self._conn.execute('DELETE FROM items WHERE date = ? AND id = ?', (m['date'], m['id']))
+                elif m['op'] == 'drop':
+                    self._conn.execute('DELETE FROM items WHERE date = ?', (m['date'],))
+            self._write_days(days, {m['date'] for m in mutations})
+    
+    def drop_before(self, cutoff):
+        """Delete every day older than cutoff and return the dates removed"""
+        with self._lock, self._conn:
+            dates = [date for date, in self._conn.execute(
+                'SELECT date FROM days WHERE date < ?', (cutoff,))]
+            self._conn.execute('DELETE FROM items WHERE date < ?', (cutoff,))
+            self._conn.execute('DELETE FROM days WHERE date < ?', (cutoff,))
+        return dates
+    
+    def import_data(self, data, days):
+        """Bulk insert {date: [items]} and day summaries as loaded from a JSON data file"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                '''INSERT OR REPLACE INTO items (date, id, category, total_amount, body)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (self._row(date, item) for date, items in data.items() for item in items))
+            self._write_days(days, days.keys())
+    
+    def size(self):
+        return file_size(self.db_file) + file_size(f"{self.db_file}-wal")
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def migrate_json(json_file, storage):
+    """Import an existing inventory_data.json into a SQLite or partitioned store"""
+    data, days = JsonFileStorage(json_file).load()
+    for date, items in data.items():
+        renumber_duplicate_ids(date, items, days.get(date))
+        if not is_current_summary(days.get(date)):
+            days[date] = build_day_summary(items, days.get(date))
+    try:
+        storage.import_data(data, days)
+    finally:
+        storage.close()
+    count = sum(len(items) for items in data.values())
+    logger.info(f"Migrated {count} items over {len(data)} days from {json_file}")
+    return count
+
+class PartitionedStorage:
+    """Keeps one JSON file per date in a directory.
+    
+    Each partition holds the day's items and summary; _days.json caches all
+    summaries so startup reads one small file. A save rewrites only the days
+    it touched, and retention just unlinks expired partitions.
+    """
+    lazy = True
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.days_file = os.path.join(directory, '_days.json')
+        self.lock_file = os.path.join(directory, '_writer.lock')
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, date):
+        if not re.fullmatch(r'[\w-]+', date):
+            raise ValueError(f"Invalid date: {date}")
+        return os.path.join(self.directory, f"{date}.json")
+    
+    def _partition_dates(self):
+        return [name[:-5] for name in os.listdir(self.directory)
+                if name.endswith('.json') and not name.startswith('_')]
+    
+    def _read_partition(self, date):
+        try:
+            with open(self._path(date), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def load(self):
+        with self._lock:
+            days, days_mtime = {}, 0
+            if os.path.exists(self.days_file):
+                with open(self.days_file, 'r', encoding='utf-8') as f:
+                    days = json.load(f)
+                days_mtime = os.path.getmtime(self.days_file)
+            # Partitions written after the summary cache (a crash between the two
+            # writes) carry their own summary
+            stale = [date for date in self._partition_dates()
+                     if date not in days or os.path.getmtime(self._path(date)) > days_mtime]
+            for date in stale:
+                partition = self._read_partition(date)
+                if partition is not None:
+                    days[date] = partition['summary']
+            if stale:
+                write_json_atomic(self.days_file, days)
+        return {}, days
+    
+    def load_day(self, date):
+        with self._lock:
+            partition = self._read_partition(date)
+        return partition['items'] if partition else []
+    
+    def save(self, data, days, mutations):
+        with self._lock:
+            for date in {m['date'] for m in mutations}:
+                if date in days and date in data:
+                    write_json_atomic(self._path(date), {'summary': days[date], 'items': data[date]})
+                elif date not in days and os.path.exists(self._path(date)):
+                    os.remove(self._path(date))
+            write_json_atomic(self.days_file, days)
+    
+    def drop_before(self, cutoff):
+        """Unlink every partition older than cutoff and return the dates removed"""
+        with self._lock:
+            dates = [date for date in self._partition_dates() if date < cutoff]
+            for date in dates:
+                os.remove(self._path(date))
+            if dates:
+                with open(self.days_file, 'r', encoding='utf-8') as f:
+                    days = json.load(f)
+                for date in dates:
+                    days.pop(date, None)
+                write_json_atomic(self.days_file, days)
+        return dates
+    
+    def import_data(self, data, days):
+        """Write {date: [items]} and day summaries as loaded from a JSON data file"""
+        with self._lock:
+            for date, items in data.items():
+                write_json_atomic(self._path(date), {'summary': days[date], 'items': items})
+            write_json_atomic(self.days_file, days)
+    
+    def size(self):
+        return sum(file_size(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+    
+    def close(self):
+        pass
+
+ARCHIVE_TEXT_COLUMNS = ('name', 'category')
+ARCHIVE_NUMBER_COLUMNS = ('price', 'unitsSold', 'totalAmount')
+
+def item_number(item, field):
+    """Numeric item field as a float, NaN when missing or not a number"""
+    try:
+        return float(item.get(field))
+    except (TypeError, ValueError):
+        return float('nan')
+
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def is_iso_date(date):
+    """Whether date is a valid YYYY-MM-DD string"""
+    if not isinstance(date, str) or not ISO_DATE_PATTERN.fullmatch(date):
+        return False
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
+
+def item_columns(items_by_date):
+    """Columns of {date: [items]}: dates as YYYYMMDD ints, text as strings, numbers as floats.
+    
+    Days not keyed YYYY-MM-DD (stored before dates were validated) are left out.
+    """
+    skipped = [date for date in items_by_date if not is_iso_date(date)]
+    if skipped:
+        logger.warning(f"Skipping days with non-ISO dates: {skipped}")
+    rows = [(date, item) for date, items in items_by_date.items() if is_iso_date(date) for item in items]
+    return {
+        'date': np.array([int(date.replace('-', '')) for date, _ in rows], dtype=np.int32),
+        'name': np.array([str(item.get('name') or '').strip() for _, item in rows], dtype=str),
+        'category': np.array([item.get('category') or 'other' for _, item in rows], dtype=str),
+        'price': np.array([item_number(item, 'price') for _, item in rows], dtype=np.float64),
+        'unitsSold': np.array([item_number(item, 'unitsSold') for _, item in rows], dtype=np.float64),
+        'totalAmount': np.array([item_amount(item) for _, item in rows], dtype=np.float64)
+    }
+
+def concat_columns(parts):
+    parts = [part for part in parts if len(part['date'])]
+    if not parts:
+        return item_columns({})
+    return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+
+class ColumnarArchive:
+    """Expired days, one compressed .npz file of columns per month (YYYY-MM.npz).
+    
+    Names and categories are dictionary-encoded (a string table plus int32
+    codes per item); price, unitsSold and totalAmount are float64 arrays with
+    NaN for missing values. Archiving a day that is already in its month file
+    replaces it, so a cleanup interrupted before the drop was saved can rerun.
+    """
+    def __init__(self, directory, cache_months=ARCHIVE_CACHE_MONTHS):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.cache_months = cache_months
+        self._lock = threading.Lock()
+        # month -> decoded columns, least recently used first
+        self._cache = OrderedDict()
+    
+    def _path(self, month):
+        return os.path.join(self.directory, f"{month}.npz")
+    
+    def months(self, date_from=None, date_to=None):
+        """Archived months overlapping date_from..date_to, oldest first"""
+        months = sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith('.npz'))
+        return [month for month in months
+                if (not date_from or month >= date_from[:7]) and (not date_to or month <= date_to[:7])]
+    
+    def _read(self, month):
+        with self._lock:
+            if month in self._cache:
+                self._cache.move_to_end(month)
+                return self._cache[month]
+        with np.load(self._path(month), allow_pickle=False) as npz:
+            columns = {'date': npz['date']}
+            for column in ARCHIVE_TEXT_COLUMNS:
+                columns[column] = npz[f'{column}_values'][npz[f'{column}_codes']]
+            for column in ARCHIVE_NUMBER_COLUMNS:
+                columns[column] = npz[column]
+        with self._lock:
+            self._cache[month] = columns
+            while len(self._cache) > max(self.cache_months, 0):
+                self._cache.popitem(last=False)
+        return columns
+    
+    def _write(self, month, columns):
+        arrays = {'date': columns['date']}
+        for column in ARCHIVE_TEXT_COLUMNS:
+            values, codes = np.unique(columns[column], return_inverse=True)
+            arrays[f'{column}_values'] = values
+            arrays[f'{column}_codes'] = codes.astype(np.int32)
+        for column in ARCHIVE_NUMBER_COLUMNS:
+            arrays[column] = columns[column]
+        tmp_file = f"{self._path(month)}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self._path(month))
+        with self._lock:
+            self._cache.pop(month, None)
+    
+    def append(self, items_by_date):
+        """Archive {date: [items]}, rewriting each affected month file once"""
+        by_month = {}
+        for date, items in items_by_date.items():
+            by_month.setdefault(date[:7], {})[date] = items
+        for month, days in sorted(by_month.items()):
+            new = item_columns(days)
+            if os.path.exists(self._path(month)):
+                old = self._read(month)
+                keep = ~np.isin(old['date'], new['date'])
+                new = concat_columns([{column: values[keep] for column, values in old.items()}, new])
+            self._write(month, new)
+    
+    def columns(self, date_from=None, date_to=None):
+        """Archived items dated date_from..date_to as columns"""
+        low = int(date_from.replace('-', '')) if date_from else 0
+        high = int(date_to.replace('-', '')) if date_to else 99999999
+        parts = []
+        for month in self.months(date_from, date_to):
+            columns = self._read(month)
+            mask = (columns['date'] >= low) & (columns['date'] <= high)
+            parts.append({column: values[mask] for column, values in columns.items()})
+        return concat_columns(parts)
+    
+    def size(self):
+        """Bytes on disk"""
+        return sum(file_size(self._path(month)) for month in self.months())
+
+def analyze_columns(columns, period='day', top=ANALYTICS_TOP_ITEMS):
+    """Totals, top items and per-category trend over item columns.
+    
+    Every reduction is a NumPy group-by: np.unique codes the keys and
+    np.bincount sums each group in one pass.
+    """
+    dates, amounts = columns['date'], columns['totalAmount']
+    units = np.nan_to_num(columns['unitsSold'])
+    day_keys = np.unique(dates)
+    totals = {
+        'days': len(day_keys),
+        'item_count': len(dates),
+        'units_sold': float(units.sum()),
+        'total_sales': float(amounts.sum())
+    }
+    totals['avg_daily_sales'] = totals['total_sales'] / max(totals['days'], 1)
+    
+    names, name_codes = np.unique(columns['name'], return_inverse=True)
+    name_sales = np.bincount(name_codes, weights=amounts, minlength=len(names))
+    name_units = np.bincount(name_codes, weights=units, minlength=len(names))
+    name_counts = np.bincount(name_codes, minlength=len(names))
+    top_items = [{
+        'name': str(names[i]),
+        'total_sales': float(name_sales[i]),
+        'units_sold': float(name_units[i]),
+        'item_count': int(name_counts[i])
+    } for i in np.argsort(-name_sales, kind='stable')[:top]]
+    
+    keys = dates // 100 if period == 'month' else dates
+    periods, period_codes = np.unique(keys, return_inverse=True)
+    categories, category_codes = np.unique(columns['category'], return_inverse=True)
+    cells = category_codes * len(periods) + period_codes
+    shape = (len(categories), len(periods))
+    sales = np.bincount(cells, weights=amounts, minlength=shape[0] * shape[1]).reshape(shape)
+    counts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+    
+    def label(key):
+        key = str(key)
+        return f"{key[:4]}-{key[4:6]}" if period == 'month' else f"{key[:4]}-{key[4:6]}-{key[6:]}"
+    
+    return {
+        'totals': totals,
+        'top_items': top_items,
+        'categories': {str(category): {'item_count': int(counts[i].sum()), 'total_sales': float(sales[i].sum())}
+                       for i, category in enumerate(categories)},
+        'trend': {
+            'period': period,
+            'periods': [label(key) for key in periods],
+            'categories': {str(category): {'item_count': counts[i].tolist(), 'total_sales': sales[i].tolist()}
+                           for i, category in enumerate(categories)}
+        }
+    }
+
+def create_storage(backend, data_file):
+    """Build the storage backend named by INVENTORY_STORAGE"""
+    if backend == 'journal':
+        return JournalStorage(data_file)
+    if backend == 'sqlite':
+        return SqliteStorage(SQLITE_FILE)
+    if backend == 'partitioned':
+        return PartitionedStorage(PARTITION_DIR)
+    if backend == 'json':
+        return JsonFileStorage(data_file)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+class ReadWriteLock:
+    """Shared lock for readers, exclusive lock for one writer.
+    
+    Waiting writers hold back new readers so a stream of reads can't starve
+    them. A thread already inside the lock may enter it again for reading, and
+    the writing thread may enter it again for either.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writers_waiting = 0
+        self._local = threading.local()
+    
+    @contextlib.contextmanager
+    def read(self):
+        if self._writer == threading.get_ident() or getattr(self._local, 'reading', False):
+            yield
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reading = True
+        try:
+            yield
+        finally:
+            self._local.reading = False
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextlib.contextmanager
+    def write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        if getattr(self._local, 'reading', False):
+            raise RuntimeError('Cannot upgrade a read lock to a write lock')
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+class ProcessLock:
+    """Exclusive lock file marking the one process allowed to serve a data store"""
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+    
+    def acquire(self):
+        if fcntl is None:
+            logger.warning(f"File locking unavailable; make sure only one process serves {self.path}")
+            return
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.seek(0)
+            owner = lock_file.read().strip() or 'unknown'
+            lock_file.close()
+            raise RuntimeError(f"{self.path} is held by another process (pid {owner}); serve the "
+                               f"inventory from one process with several threads instead")
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+    
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+def read_locked(method):
+    """Run an InventoryManager method under the shared (read) lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def write_locked(method):
+    """Run an InventoryManager method under the exclusive lock, then commit its changes.
+    
+    The commit happens after the lock is released, so writers that queued up
+    meanwhile are persisted together with this one (group commit).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write():
+            result = method(self, *args, **kwargs)
+            ticket = self._staged_seq
+        self._commit(ticket)
+        return result
+    return wrapper
+
 class InventoryManager:
-    def __init__(self, data_file):
+    def __init__(self, data_file, storage=None, archive=None):
         self.data_file = data_file
+        self.storage = storage or JsonFileStorage(data_file)
+        # Where expired days go (None deletes them)
+        self.archive = archive
+        self.lazy = getattr(self.storage, 'lazy', False)
+        self._process_lock = None
+        if PROCESS_LOCK:
+            self._process_lock = ProcessLock(getattr(self.storage, 'lock_file', f"{data_file}.lock"))
+            self._process_lock.acquire()
+        self._lock = ReadWriteLock()
+        # Guards the lazy day cache, which readers fill and evict concurrently
+        self._cache_lock = threading.RLock()
+        # Mutations applied in memory but not persisted yet, and their batch numbers
+        self._commit_lock = threading.Lock()
+        self._pending = []
+        self._staged_seq = 0
+        self._committed_seq = 0
+        self._retention_stop = threading.Event()
+        # Days with unsaved changes, which the day cache must not evict yet
+        self._pinned = set()
         self.load_data()
         self.cleanup_old_data()
     
+    def start_retention_job(self, interval):
+        """Run cleanup_old_data every `interval` seconds on a background thread"""
+        def run():
+            while not self._retention_stop.wait(interval):
+                self.cleanup_old_data()
+        threading.Thread(target=run, name='retention', daemon=True).start()
+    
+    def stop_retention_job(self):
+        self._retention_stop.set()
+    
+    def close(self):
+        """Stop background work, close the storage and let another process take over"""
+        self.stop_retention_job()
+        self._commit(self._staged_seq)
+        self.storage.close()
+        if self._process_lock is not None:
+            self._process_lock.release()
+    
+    @write_locked
+    @metrics.timed('storage_seconds', operation='load_data')
     def load_data(self):
-        """Load data from JSON file"""
+        """Load data and day summaries from the storage backend"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-            else:
-                self.data = {}
+            self.data, self.days = self.storage.load()
         except Exception as e:
             logger.error(f"Error loading data: {e}")
-            self.data = {}
+            self.data, self.days = {}, {}
+        # id -> list position, per day held in memory
+        self._positions = {}
+        self._dates = []
+        if self.lazy:
+            # Only a few recently used days are kept in memory
+            self.data = OrderedDict(self.data)
+        renumbered = [date for date, items in self.data.items()
+                      if renumber_duplicate_ids(date, items, self.days.get(date))]
+        for date, items in self.data.items():
+            self._index_day(date, items)
+        for date, summary in self.days.items():
+            if not is_current_summary(summary):
+                self.days[date] = build_day_summary([], summary)
+            self.days[date].setdefault('version', 0)
+        # Recent changes per day, newest last, as (version, item id, item or None if deleted)
+        self._changes = {}
+        # Running totals over every retained day, kept up to date by each mutation
+        self.totals = new_summary()
+        del self.totals['next_id']
+        del self.totals['version']
+        for summary in self.days.values():
+            account_summary(self.totals, summary, 1)
+        # Every retained date in order, for range queries
+        self._dates = sorted(self.days)
+        if renumbered:
+            # Persist the new ids; a drop and re-add replays the same on every backend
+            mutations = []
+            for date in renumbered:
+                version = self.days[date]['version']
+                mutations.append({'op': 'drop', 'date': date})
+                mutations.extend({'op': 'add', 'date': date, 'item': item, 'version': version}
+                                 for item in self.data[date])
+            self._stage(mutations)
     
-    def save_data(self):
-        """Save data to JSON file"""
+    @metrics.timed('storage_seconds', operation='save_data')
+    def save_data(self, mutations=None):
+        """Persist data; mutations lists the changes made since the last save"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            self.storage.save(self.data, self.days, mutations or [])
         except Exception as e:
             logger.error(f"Error saving data: {e}")
     
+    def _stage(self, mutations):
+        """Queue mutations applied in memory for the next commit"""
+        self._pending.extend(mutations)
+        self._pinned.update(m['date'] for m in mutations)
+        self._staged_seq += 1
+    
+    def _commit(self, ticket):
+        """Persist every staged mutation up to batch `ticket` with one save.
+        
+        Whichever writer gets here first saves the batches of all writers that
+        staged before it; the others find their batch already committed.
+        """
+        with self._commit_lock:
+            if self._committed_seq >= ticket:
+                return
+            # Readers may continue during the save; writers wait for it
+            with self._lock.read():
+                mutations, self._pending = self._pending, []
+                committed = self._staged_seq
+                if mutations:
+                    self.save_data(mutations)
+                self._pinned = set()
+                self._committed_seq = committed
+    
+    def _index_day(self, date, items):
+        """Build the id index of a day just loaded into memory"""
+        self._positions[date] = {item['id']: i for i, item in enumerate(items)}
+        if date not in self.days:
+            bisect.insort(self._dates, date)
+        if not is_current_summary(self.days.get(date)):
+            # Data written before ids were counted and aggregated per day
+            self.days[date] = build_day_summary(items, self.days.get(date))
+    
+    def _day(self, date, create=False):
+        """Items list for date, read from lazy storage on first use.
+        
+        Readers call this concurrently; hold _cache_lock while using the
+        returned list's positions so the day isn't evicted in between.
+        """
+        with self._cache_lock:
+            if date in self.data:
+                if self.lazy:
+                    self.data.move_to_end(date)
+                return self.data[date]
+            items = self.storage.load_day(date) if self.lazy else []
+            if not items and not create:
+                return None
+            self.data[date] = items
+            self._index_day(date, items)
+            if self.lazy:
+                # Evict least recently used days, oldest first
+                for cached in list(self.data):
+                    if len(self.data) <= max(DAY_CACHE_SIZE, 1):
+                        break
+                    if cached not in self._pinned and cached != date:
+                        del self.data[cached]
+                        del self._positions[cached]
+            return items
+    
+    def _account(self, date, item, sign):
+        account_item(self.days[date], item, sign)
+        account_item(self.totals, item, sign)
+    
+    def _record_change(self, date, item_id, item):
+        """Bump the day's version and log the change; returns the new version"""
+        summary = self.days[date]
+        summary['version'] = summary.get('version', 0) + 1
+        log = self._changes.get(date)
+        if log is None:
+            log = self._changes[date] = deque(maxlen=CHANGE_LOG_SIZE)
+        log.append((summary['version'], item_id, item))
+        return summary['version']
+    
+    def _forget_day(self, date):
+        self.data.pop(date, None)
+        self._positions.pop(date, None)
+        self._changes.pop(date, None)
+        summary = self.days.pop(date, None)
+        if summary:
+            account_summary(self.totals, summary, -1)
+        index = bisect.bisect_left(self._dates, date)
+        if index < len(self._dates) and self._dates[index] == date:
+            del self._dates[index]
+    
+    @write_locked
     def cleanup_old_data(self):
-        """Remove data older than RETENTION_DAYS"""
+        """Remove data older than RETENTION_DAYS, archiving it first when an archive is set"""
         try:
             cutoff_date = datetime.now() - timedelta(days=RETENTION_DAYS)
             cutoff_str = cutoff_date.strftime('%Y-%m-%d')
+            if self.archive is not None:
+                # Nothing is removed unless the archive write succeeded. Days
+                # with non-ISO dates can't be archived and are only removed
+                expired = self._dates[:bisect.bisect_left(self._dates, cutoff_str)]
+                self._archive_days([date for date in expired if is_iso_date(date)])
+            if self.lazy:
+                dates_to_remove = self.storage.drop_before(cutoff_str)
+                for date_str in dates_to_remove:
+                    self._forget_day(date_str)
+                    logger.info(f"Cleaned up data for {date_str}")
+                return
             dates_to_remove = []
-            for date_str in self.data.keys():
+            for date_str in self.days.keys() | self.data.keys():
                 if date_str < cutoff_str:
                     dates_to_remove.append(date_str)
             for date_str in dates_to_remove:
-                del self.data[date_str]
+                self._forget_day(date_str)
                 logger.info(f"Cleaned up data for {date_str}")
             if dates_to_remove:
-                self.save_data()
+                self._stage([{'op': 'drop', 'date': date_str} for date_str in dates_to_remove])
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
     
+    @metrics.timed('storage_seconds', operation='archive')
+    def _archive_days(self, dates):
+        if not dates:
+            return
+        items_by_date = {}
+        for date in dates:
+            items = self.data.get(date)
+            if items is None:
+                items = self.storage.load_day(date) if self.lazy else []
+            items_by_date[date] = items
+        self.archive.append(items_by_date)
+        logger.info(f"Archived {sum(map(len, items_by_date.values()))} items from {len(dates)} days")
+    
+    @read_locked
+    def _hot_columns(self, date_from=None, date_to=None):
+        """Retained items dated date_from..date_to as columns"""
+        lo = bisect.bisect_left(self._dates, date_from or '')
+        hi = bisect.bisect_right(self._dates, date_to) if date_to else len(self._dates)
+        items_by_date = {}
+        for date in self._dates[lo:hi]:
+            # Days stored under a malformed date have no place on the timeline
+            if not self.days[date]['item_count'] or not is_iso_date(date):
+                continue
+            with self._cache_lock:
+                items = self.data.get(date)
+                if items is None:
+                    items = self.storage.load_day(date) if self.lazy else []
+                items_by_date[date] = list(items)
+        return item_columns(items_by_date)
+    
+    @metrics.timed('storage_seconds', operation='analytics')
+    def analytics(self, date_from=None, date_to=None, period='day', category=None, top=ANALYTICS_TOP_ITEMS):
+        """Totals, top items and category trend over archived and retained days"""
+        hot = self._hot_columns(date_from, date_to)
+        parts = [hot]
+        archived_items = 0
+        if self.archive is not None:
+            archived = self.archive.columns(date_from, date_to)
+            # A day archived just before a crash may still be retained; the retained copy wins
+            keep = ~np.isin(archived['date'], hot['date'])
+            archived = {column: values[keep] for column, values in archived.items()}
+            archived_items = len(archived['date'])
+            parts.insert(0, archived)
+        columns = concat_columns(parts)
+        if category:
+            mask = columns['category'] == category
+            columns = {column: values[mask] for column, values in columns.items()}
+        result = analyze_columns(columns, period, top)
+        result['sources'] = {'archived_items': archived_items, 'retained_items': len(hot['date'])}
+        return result
+    
+    @read_locked
+    def summarize(self):
+        """Day, item and sales totals over all retained data"""
+        return {
+            'total_days': len(self.days),
+            'total_items': self.totals['item_count'],
+            'total_sales': self.totals['total_sales']
+        }
+    
+    @read_locked
+    def get_day_summary(self, date):
+        """Item count, sales total and category totals for one day"""
+        summary = self.days.get(date) or new_summary()
+        return {
+            'item_count': summary['item_count'],
+            'total_sales': summary['total_sales'],
+            'categories': {category: dict(totals) for category, totals in summary['categories'].items()}
+        }
+    
+    @read_locked
+    def get_category_totals(self):
+        """Item count and sales total per category over all retained data"""
+        return {category: dict(totals) for category, totals in self.totals['categories'].items()}
+    
+    @read_locked
+    def memory_item_count(self):
+        """Items currently held in memory (only cached days for lazy backends)"""
+        with self._cache_lock:
+            return sum(len(items) for items in self.data.values())
+    
+    @read_locked
     def get_items_by_date(self, date):
         """Get all items for a specific date"""
-        return self.data.get(date, [])
+        # A copy, so callers can serialize it after the lock is released
+        return list(self._day(date) or [])
+    
+    @read_locked
+    def get_day_version(self, date):
+        """Version of a day, bumped by every change to its items (0 for unknown days)"""
+        summary = self.days.get(date)
+        return summary['version'] if summary else 0
+    
+    @read_locked
+    def get_items_versioned(self, date):
+        """(items, version) of one day, read atomically"""
+        return list(self._day(date) or []), self.get_day_version(date)
+    
+    @read_locked
+    def get_changes(self, date, since):
+        """Items changed and ids deleted on a day after version `since`.
+        
+        When the change log no longer reaches back to `since` (or the server
+        restarted), the whole day is returned with reset=True instead.
+        """
+        version = self.get_day_version(date)
+        if since == version:
+            return {'version': version, 'items': [], 'deleted': []}
+        log = self._changes.get(date)
+        if since > version or not log or log[0][0] > since + 1:
+            return {'version': version, 'reset': True, 'items': list(self._day(date) or []), 'deleted': []}
+        latest = {}
+        for change_version, item_id, item in log:
+            if change_version > since:
+                latest.pop(item_id, None)
+                latest[item_id] = item
+        return {
+            'version': version,
+            'items': [item for item in latest.values() if item is not None],
+            'deleted': [item_id for item_id, item in latest.items() if item is None]
+        }
+    
+    @read_locked
+    def query_items(self, date_from=None, date_to=None, category=None, after=None, limit=None):
+        """Items dated date_from..date_to (inclusive), in date then id order.
+        
+        `after` is the id of the last item of the previous page. Returns
+        (items, next_cursor); next_cursor is None once the range is exhausted.
+        Days without matching items are skipped using their summaries, and
+        lazy backends read uncached days without churning the day cache.
+        """
+        after_date, after_key = None, None
+        start = date_from or ''
+        if after:
+            after_date, after_key = after.rsplit('_', 1)[0], item_order(after)
+            start = max(start, after_date)
+        lo = bisect.bisect_left(self._dates, start)
+        hi = bisect.bisect_right(self._dates, date_to) if date_to else len(self._dates)
+        
+        page = []
+        for index in range(lo, hi):
+            date = self._dates[index]
+            summary = self.days[date]
+            if not summary['item_count'] or (category and category not in summary['categories']):
+                continue
+            with self._cache_lock:
+                items = self.data.get(date)
+                if items is None:
+                    items = self.storage.load_day(date) if self.lazy else []
+                # Lists are in insertion order, which renumbered legacy ids break;
+                # already sorted days cost one linear pass
+                for item in sorted(items, key=lambda item: item_order(item['id'])):
+                    if date == after_date and item_order(item['id']) <= after_key:
+                        continue
+                    if category and (item.get('category') or 'other') != category:
+                        continue
+                    page.append(item)
+                    if limit and len(page) >= limit:
+                        return page, item['id']
+        return page, None
     
     def add_item(self, date, item):
         """Add item to specific date"""
-        if date not in self.data:
-            self.data[date] = []
-        item['id'] = f"{date}_{len(self.data[date])}"
-        item['timestamp'] = datetime.now().isoformat()
-        self.data[date].append(item)
-        self.save_data()
-        return item
+        return self.add_items([(date, item)])[0]
     
+    @write_locked
+    def add_items(self, entries):
+        """Add (date, item) pairs, possibly over several dates, with one save"""
+        mutations = []
+        # Days of the batch stay cached until it is committed
+        self._pinned.update(date for date, _ in entries)
+        for date, item in entries:
+            items = self._day(date, create=True)
+            # Ids come from a per-day counter, so an id is never reused after a delete
+            summary = self.days[date]
+            item['id'] = f"{date}_{summary['next_id']}"
+            summary['next_id'] += 1
+            item['timestamp'] = datetime.now().isoformat()
+            self._positions[date][item['id']] = len(items)
+            items.append(item)
+            self._account(date, item, 1)
+            version = self._record_change(date, item['id'], item)
+            mutations.append({'op': 'add', 'date': date, 'item': item, 'version': version})
+        self._stage(mutations)
+        return [item for _, item in entries]
+    
+    @write_locked
     def update_item(self, date, item_id, updated_item):
-        """Update existing item"""
-        if date in self.data:
-            for i, item in enumerate(self.data[date]):
-                if item['id'] == item_id:
-                    self.data[date][i] = {**item, **updated_item}
-                    self.save_data()
-                    return self.data[date][i]
-        return None
+        """Update existing item, recomputing totalAmount when price or unitsSold change"""
+        items = self._day(date)
+        pos = self._positions[date].get(item_id) if items else None
+        if pos is None:
+            return None
+        updated = {**items[pos], **updated_item, 'id': item_id}
+        if 'price' in updated_item or 'unitsSold' in updated_item:
+            # Read under the write lock, so concurrent updates of either field compose
+            updated['totalAmount'] = float(updated.get('price') or 0) * float(updated.get('unitsSold') or 0)
+        self._account(date, items[pos], -1)
+        items[pos] = updated
+        self._account(date, items[pos], 1)
+        version = self._record_change(date, item_id, items[pos])
+        self._stage([{'op': 'update', 'date': date, 'item': items[pos], 'version': version}])
+        return items[pos]
     
+    @write_locked
     def delete_item(self, date, item_id):
         """Delete item"""
-        if date in self.data:
-            self.data[date] = [item for item in self.data[date] if item['id'] != item_id]
-            self.save_data()
-            return True
-        return False
+        items = self._day(date)
+        positions = self._positions.get(date, {})
+        pos = positions.pop(item_id, None) if items else None
+        if pos is None:
+            return False
+        self._account(date, items[pos], -1)
+        # Keep the day in insertion order; only items after the hole move
+        del items[pos]
+        for i in range(pos, len(items)):
+            positions[items[i]['id']] = i
+        version = self._record_change(date, item_id, None)
+        self._stage([{'op': 'delete', 'date': date, 'id': item_id, 'version': version}])
+        return True
 
-# Initialize inventory manager
-inventory_manager = InventoryManager(DATA_FILE)
+# The inventory manager is created by the serving process only (see
+# init_server), never on import: OCR pool workers started with spawn or
+# forkserver re-import this module and must not take the store lock
+inventory_manager = None
+_inventory_manager_lock = threading.Lock()
 
-def preprocess_image_for_ocr(image):
-    """Advanced image preprocessing for better OCR results"""
-    try:
+def init_inventory_manager():
+    """Create the process's inventory manager on first use and return it"""
+    global inventory_manager
+    with _inventory_manager_lock:
+        if inventory_manager is None:
+            manager = InventoryManager(DATA_FILE, create_storage(STORAGE_BACKEND, DATA_FILE),
+                                       ColumnarArchive(ARCHIVE_DIR) if ARCHIVE_ENABLED else None)
+            if RETENTION_INTERVAL > 0:
+                manager.start_retention_job(RETENTION_INTERVAL)
+            inventory_manager = manager
+    return inventory_manager
+
+@metrics.timed('image_decode_seconds')
+def decode_image_bytes(image_bytes, max_side=None):
+    """Decode an uploaded photo straight into a BGR array, downscaled for OCR.
+    
+    JPEGs are decoded at 1/2, 1/4 or 1/8 resolution by libjpeg when the frame is
+    that much larger than max_side, so a 12MP photo is never expanded in full.
+    Returns (image, size_info).
+    """
+    max_side = OCR_MAX_IMAGE_SIDE if max_side is None else max_side
+    # Reading the header only gives the dimensions without decoding pixels
+    width, height = Image.open(io.BytesIO(image_bytes)).size
+    
+    flag = cv2.IMREAD_COLOR
+    if max_side:
+        for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                     (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                     (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if max(width, height) / factor >= max_side:
+                flag = reduced_flag
+                break
+    
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+    if image is None:
+        # Formats OpenCV can't decode go through PIL
+        metrics.inc('fallbacks_total', route=current_route(), kind='pil_decode')
+        pil_image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        image = cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+    
+    if max_side and max(image.shape[:2]) > max_side:
+        scale = max_side / max(image.shape[:2])
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    return image, {
+        'original_width': width,
+        'original_height': height,
+        'width': image.shape[1],
+        'height': image.shape[0]
+    }
+
+def read_scan_request():
+    """Get the uploaded image bytes and scan options from the current request.
+    
+    Accepts a multipart 'image' file, a raw image/* or octet-stream body, or
+    the React Native client's JSON body with a base64 'image'.
+    Raises ValueError when no image was sent.
+    """
+    if 'image' in request.files:
+        return request.files['image'].read(), request.form.to_dict()
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        return request.get_data(), request.args.to_dict()
+    data = request.get_json(silent=True) or {}
+    logger.info(f"Received OCR request with keys: {list(data.keys())}")
+    if 'image' not in data:
+        raise ValueError('No image provided')
+    return base64.b64decode(data['image']), data
+
+def get_search_mode(options):
+    """Validated OCR search mode from request options (None for the default)"""
+    search = options.get('search')
+    if search and search not in ('exhaustive', 'adaptive', 'layout'):
+        raise ValueError(f'Unknown search mode: {search}')
+    return search
+
+class PreprocessingPipeline:
+    """Lazily evaluated preprocessing of one image for OCR.
+    
+    Intermediate stages (grayscale, text-region crop, CLAHE, blur) are computed
+    once and shared, and a variant is only built the first time the OCR search
+    asks for it. Behaves as a read-only mapping of variant name -> image.
+    Stage timings in milliseconds are collected in `timings`.
+    """
+    VARIANTS = ('original', 'clahe_denoised', 'otsu_threshold',
+                'adaptive_threshold', 'morphological', 'sharpened')
+    
+    def __init__(self, image, crop=None):
+        self.image = image
+        self.crop = OCR_TEXT_CROP if crop is None else crop
+        self.text_region = None
+        self.timings = {}
+        self._stages = {}
+        self._lock = threading.RLock()
+    
+    def __iter__(self):
+        return iter(self.VARIANTS)
+    
+    def __len__(self):
+        return len(self.VARIANTS)
+    
+    def keys(self):
+        return list(self.VARIANTS)
+    
+    def __getitem__(self, name):
+        if name not in self.VARIANTS:
+            raise KeyError(name)
+        return self.stage(name)
+    
+    @property
+    def computed_variants(self):
+        return [name for name in self.VARIANTS if name in self._stages]
+    
+    def stage(self, name):
+        """Return a stage's output, computing it (and what it depends on) once"""
+        with self._lock:
+            if name not in self._stages:
+                started = time.perf_counter()
+                result = getattr(self, f'_build_{name}')()
+                elapsed = time.perf_counter() - started
+                self.timings[name] = round(elapsed * 1000, 2)
+                metrics.observe('preprocessing_seconds', elapsed, stage=name)
+                self._stages[name] = result
+            return self._stages[name]
+    
+    def _build_gray(self):
         # Convert to grayscale if not already
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
-        
-        # Apply multiple preprocessing techniques
-        processed_images = []
-        
-        # Original grayscale
-        processed_images.append(('original', gray))
-        
-        # Method 1: CLAHE + Denoising
+        if len(self.image.shape) == 3:
+            return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self.image
+    
+    def _build_original(self):
+        gray = self.stage('gray')
+        if not self.crop:
+            return gray
+        self.text_region = detect_text_region(gray)
+        if self.text_region is None:
+            return gray
+        x, y, w, h = self.text_region
+        return gray[y:y + h, x:x + w]
+    
+    def _build_clahe(self):
         clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        clahe_enhanced = clahe.apply(gray)
-        denoised = cv2.fastNlMeansDenoising(clahe_enhanced, h=10)
-        processed_images.append(('clahe_denoised', denoised))
-        
-        # Method 2: Gaussian blur + Threshold
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, thresh_binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        processed_images.append(('otsu_threshold', thresh_binary))
-        
-        # Method 3: Adaptive threshold
-        adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                               cv2.THRESH_BINARY, 11, 2)
-        processed_images.append(('adaptive_threshold', adaptive_thresh))
-        
-        # Method 4: Morphological operations
+        return clahe.apply(self.stage('original'))
+    
+    def _build_blurred(self):
+        return cv2.GaussianBlur(self.stage('original'), (5, 5), 0)
+    
+    def _build_clahe_denoised(self):
+        # CLAHE + Denoising
+        return cv2.fastNlMeansDenoising(self.stage('clahe'), h=10)
+    
+    def _build_otsu_threshold(self):
+        # Gaussian blur + Threshold
+        _, thresh_binary = cv2.threshold(self.stage('blurred'), 0, 255,
+                                         cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return thresh_binary
+    
+    def _build_adaptive_threshold(self):
+        return cv2.adaptiveThreshold(self.stage('original'), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 11, 2)
+    
+    def _build_morphological(self):
         kernel = np.ones((2,2), np.uint8)
-        morph = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-        processed_images.append(('morphological', morph))
-        
-        # Method 5: Edge enhancement
+        return cv2.morphologyEx(self.stage('original'), cv2.MORPH_CLOSE, kernel)
+    
+    def _build_sharpened(self):
+        # Edge enhancement
         kernel_sharpen = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(gray, -1, kernel_sharpen)
-        processed_images.append(('sharpened', sharpened))
-        
-        return processed_images
-        
+        return cv2.filter2D(self.stage('original'), -1, kernel_sharpen)
+
+def detect_text_region(gray, work_side=800, padding=0.04):
+    """Bounding box (x, y, w, h) of the text-bearing area of a grayscale image.
+    
+    Works on a downscaled copy: a morphological gradient picks up glyph edges,
+    a wide closing merges characters into lines, and the union of line-shaped
+    blobs is padded and scaled back. Returns None when no useful crop is found.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, work_side / max(height, width))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT,
+                                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    lines = cv2.morphologyEx(binary, cv2.MORPH_CLOSE,
+                             cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Keep blobs shaped like text lines, not specks or the whole frame
+        if w >= 8 and 4 <= h <= small.shape[0] * 0.5 and w >= h:
+            boxes.append((x, y, x + w, y + h))
+    if not boxes:
+        return None
+    
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[2] for b in boxes)
+    y1 = max(b[3] for b in boxes)
+    pad_x = int((x1 - x0) * padding) + 2
+    pad_y = int((y1 - y0) * padding) + 2
+    x0, y0 = max(0, x0 - pad_x), max(0, y0 - pad_y)
+    x1, y1 = min(small.shape[1], x1 + pad_x), min(small.shape[0], y1 + pad_y)
+    
+    area = (x1 - x0) * (y1 - y0) / float(small.shape[0] * small.shape[1])
+    if area > 0.9 or area < 0.01:
+        return None
+    return (int(x0 / scale), int(y0 / scale), int((x1 - x0) / scale), int((y1 - y0) / scale))
+
+def segment_text_lines(binary, min_height=6, padding=0.25):
+    """Row bands (y0, y1) of the text lines in a binarized image (dark text on light).
+    
+    Uses the horizontal projection profile: rows holding ink are grouped into
+    runs, runs split by a gap of a row or two are merged, and each band is
+    padded so ascenders and descenders survive the crop.
+    """
+    height, width = binary.shape[:2]
+    profile = np.count_nonzero(binary < 128, axis=1)
+    ink_rows = profile > max(1, width * 0.005)
+    
+    bands = []
+    start = None
+    for y, has_ink in enumerate(ink_rows):
+        if has_ink and start is None:
+            start = y
+        elif not has_ink and start is not None:
+            bands.append([start, y])
+            start = None
+    if start is not None:
+        bands.append([start, height])
+    
+    merged = []
+    for band in bands:
+        if merged and band[0] - merged[-1][1] <= 2:
+            merged[-1][1] = band[1]
+        else:
+            merged.append(band)
+    
+    lines = []
+    for y0, y1 in merged:
+        if y1 - y0 < min_height:
+            continue
+        pad = max(2, int((y1 - y0) * padding))
+        lines.append((max(0, y0 - pad), min(height, y1 + pad)))
+    return lines
+
+def preprocess_image_for_ocr(image):
+    """Advanced image preprocessing for better OCR results"""
+    try:
+        pipeline = PreprocessingPipeline(image)
+        return [(name, pipeline[name]) for name in pipeline]
     except Exception as e:
         logger.error(f"Error in image preprocessing: {e}")
         return [('original', image)]
 
-def extract_text_with_multiple_configs(image):
-    """Try multiple Tesseract configurations for better results"""
+class OCRExecutor:
+    """Worker pool shared by all scans for running Tesseract calls"""
+    def __init__(self, kind='thread', max_workers=None):
+        self.kind = kind
+        self.max_workers = max(1, max_workers or os.cpu_count() or 2)
+        self._pool = None
+        self._lock = threading.Lock()
+    
+    def submit(self, fn, *args):
+        """Queue a call on the pool, creating the pool on first use"""
+        with self._lock:
+            if self._pool is None:
+                if self.kind == 'process':
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='ocr')
+            pool = self._pool
+        return pool.submit(fn, *args)
+
+ocr_executor = OCRExecutor(OCR_EXECUTOR, OCR_MAX_WORKERS)
+
+class OCRWinStats:
+    """Persistent count of which (preprocessing method, config) pair won each scan.
+    
+    Scans only update the counts in memory; one background thread writes them
+    out every `flush_interval` seconds when they changed, and at exit.
+    """
+    def __init__(self, stats_file, flush_interval=OCR_STATS_FLUSH_INTERVAL):
+        self.stats_file = stats_file
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Serializes writes of the stats file, which share one temp path
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._flusher = None
+        self.load()
+    
+    def load(self):
+        """Load win counts from JSON file"""
+        try:
+            if os.path.exists(self.stats_file):
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    stats = json.load(f)
+                self.scans = stats.get('scans', 0)
+                self.wins = stats.get('wins', {})
+            else:
+                self.scans, self.wins = 0, {}
+        except Exception as e:
+            logger.error(f"Error loading OCR stats: {e}")
+            self.scans, self.wins = 0, {}
+    
+    @staticmethod
+    def _key(method, config):
+        return f"{method}|{config}"
+    
+    def record(self, method, config):
+        """Count a scan won by method/config; the counts are saved by the flusher"""
+        with self._lock:
+            self.scans += 1
+            key = self._key(method, config)
+            self.wins[key] = self.wins.get(key, 0) + 1
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='ocr-stats-flush', daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def flush(self):
+        """Write the counts to stats_file if they changed since the last write"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                stats = {'scans': self.scans, 'wins': dict(self.wins)}
+                self._dirty = False
+            try:
+                write_json_atomic(self.stats_file, stats)
+            except Exception as e:
+                logger.error(f"Error saving OCR stats: {e}")
+                with self._lock:
+                    self._dirty = True
+    
+    def win_rate(self, method, config):
+        return self.wins.get(self._key(method, config), 0) / max(self.scans, 1)
+    
+    def order(self, pairs):
+        """Sort (method, config) pairs by past win rate, keeping grid order for ties"""
+        return sorted(pairs, key=lambda pair: -self.win_rate(*pair))
+
+ocr_win_stats = OCRWinStats(OCR_STATS_FILE)
+
+class OCRResultCache:
+    """Scan results keyed by a hash of the decoded image and the scan options.
+    
+    A bounded in-memory LRU sits in front of a SQLite store; entries expire
+    after `ttl` seconds. With phash_distance >= 0, a 64-bit difference hash
+    also matches near-identical rescans, made with the same options, among the
+    entries held in memory.
+    """
+    def __init__(self, db_file, size=256, ttl=86400, phash_distance=-1):
+        self.size = size
+        self.ttl = ttl
+        self.phash_distance = phash_distance
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.db_file = db_file
+        self._db = None
+    
+    @property
+    def _conn(self):
+        """SQLite store, opened on first use (lock held) rather than on import"""
+        if self._db is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    key TEXT PRIMARY KEY,
+                    phash TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )''')
+            conn.commit()
+            self._db = conn
+        return self._db
+    
+    @staticmethod
+    def image_key(image, *options):
+        """'<sha256 of the pixels>:<option>:...'; results only match scans with the same options"""
+        return ':'.join([hashlib.sha256(np.ascontiguousarray(image)).hexdigest(), *options])
+    
+    @staticmethod
+    def perceptual_hash(image):
+        """64-bit difference hash of the image's coarse brightness gradient"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int(''.join('1' if bit else '0' for bit in bits), 2)
+    
+    def _remember(self, key, phash, created, payload):
+        self._memory[key] = (phash, created, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+    
+    def get(self, key, phash):
+        """Return (payload, match) for a cached scan, or (None, None)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            match = 'exact'
+            if entry is None:
+                row = self._conn.execute(
+                    'SELECT phash, created, payload FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+                if row:
+                    entry = (int(row[0], 16), row[1], json.loads(row[2]))
+            if entry is None and self.phash_distance >= 0:
+                options = key.partition(':')[2]
+                for phash_key, candidate in reversed(self._memory.items()):
+                    if phash_key.partition(':')[2] == options and \
+                            bin(candidate[0] ^ phash).count('1') <= self.phash_distance:
+                        key, entry, match = phash_key, candidate, 'perceptual'
+                        break
+            if entry is not None and now - entry[1] > self.ttl:
+                self._memory.pop(key, None)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self._remember(key, *entry)
+            self.hits += 1
+            return entry[2], match
+    
+    def put(self, key, phash, payload):
+        now = time.time()
+        with self._lock:
+            self._remember(key, phash, now, payload)
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO ocr_cache (key, phash, created, payload) VALUES (?, ?, ?, ?)',
+                        (key, format(phash, '016x'), now, json.dumps(payload, ensure_ascii=False)))
+                    self._puts += 1
+                    if self._puts % 100 == 0:
+                        self._conn.execute('DELETE FROM ocr_cache WHERE created < ?', (now - self.ttl,))
+            except sqlite3.Error as e:
+                logger.error(f"Error saving OCR cache entry: {e}")
+    
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+ocr_result_cache = OCRResultCache(OCR_CACHE_FILE, OCR_CACHE_SIZE, OCR_CACHE_TTL,
+                                  OCR_CACHE_PHASH_DISTANCE) if OCR_CACHE_ENABLED else None
+
+class TesseractRuntime:
+    """Tesseract version and installed languages, probed on first use and served from memory"""
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        if self._state is None:
+            with self._lock:
+                if self._state is None:
+                    self.refresh()
+        return self._state
+    
+    def refresh(self):
+        """Probe the Tesseract binary again (e.g. after installing a language pack)"""
+        state = {'version': None, 'languages': [], 'error': None}
+        try:
+            state['version'] = str(pytesseract.get_tesseract_version())
+            state['languages'] = sorted(pytesseract.get_languages())
+        except Exception as e:
+            state['error'] = str(e)
+        state['probed_at'] = datetime.now().isoformat()
+        # Swap the whole state at once so readers never see a half-finished probe
+        self._state = state
+        logger.info(f"Tesseract runtime: version={state['version']}, languages={state['languages']}")
+        return self.info()
+    
+    @property
+    def installed(self):
+        return self.state['version'] is not None
+    
+    @property
+    def version(self):
+        return self.state['version']
+    
+    @property
+    def languages(self):
+        return self.state['languages']
+    
+    def has_language(self, lang):
+        return lang in self.state['languages']
+    
+    def info(self):
+        state = self.state
+        return {
+            'tesseract_installed': state['version'] is not None,
+            'tesseract_version': state['version'],
+            'available_languages': state['languages'],
+            'myanmar_support': 'mya' in state['languages'],
+            'probed_at': state['probed_at'],
+            'tesseract_error': state['error']
+        }
+
+tesseract_runtime = TesseractRuntime()
+
+def detect_myanmar(image):
+    """Whether an image needs the Myanmar model, from Tesseract's script detection (OSD).
+    
+    Returns (needed, info): needed is False only when OSD confidently finds
+    another script, and None when it can't tell (no osd data, too little
+    text), in which case Myanmar configs run as before.
+    """
+    if not check_myanmar_support():
+        return False, {'script': None, 'reason': 'mya not installed'}
+    if not tesseract_runtime.has_language('osd'):
+        return None, {'script': None, 'reason': 'osd not installed'}
+    started = time.perf_counter()
+    try:
+        pil_image = Image.fromarray(image) if isinstance(image, np.ndarray) else image
+        osd = pytesseract.image_to_osd(pil_image, config='--psm 0 -c min_characters_to_try=10',
+                                       output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        # OSD refuses images with too few characters
+        return None, {'script': None, 'reason': str(e).strip()[:100]}
+    finally:
+        metrics.observe('tesseract_seconds', time.perf_counter() - started, config='osd')
+    script, confidence = osd.get('script'), float(osd.get('script_conf') or 0)
+    info = {'script': script, 'confidence': confidence}
+    if script == 'Myanmar':
+        return True, info
+    if confidence >= OCR_SCRIPT_CONFIDENCE:
+        return False, info
+    return None, info
+
+def get_tesseract_configs(myanmar=None):
+    """Tesseract configurations tried on every preprocessed image.
+    
+    The slow eng+mya config is added when Myanmar is installed, unless script
+    detection ruled it out (myanmar=False).
+    """
     configs = [
         '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,- ',
         '--psm 8 --oem 3',
@@ -158,32 +2067,149 @@ def extract_text_with_multiple_configs(image):
         '--psm 4 --oem 3',
         '--psm 3 --oem 3',
         '--psm 13 --oem 3',
-        '-l eng --psm 6',
-        '-l eng+mya --psm 6' if check_myanmar_support() else '-l eng --psm 6'
+        '-l eng --psm 6'
     ]
-    
-    results = []
+    if check_myanmar_support() and myanmar is not False:
+        configs.append('-l eng+mya --psm 6')
+    return configs
+
+def with_myanmar(config):
+    """config with the eng+mya language set"""
+    return f"-l eng+mya {config}"
+
+def run_tesseract(image, config, timeout=0):
+    """Run a single Tesseract pass (module level so process pools can pickle it)"""
     pil_image = Image.fromarray(image) if isinstance(image, np.ndarray) else image
-    
-    for config in configs:
-        try:
-            text = pytesseract.image_to_string(pil_image, config=config).strip()
-            if text and len(text) > 2:  # Only keep meaningful results
-                results.append((config, text))
-                logger.info(f"Config '{config}' extracted: {text[:50]}...")
-        except Exception as e:
-            logger.warning(f"Config '{config}' failed: {e}")
+    return pytesseract.image_to_string(pil_image, config=config, timeout=timeout).strip()
+
+def run_tesseract_words(image, config, timeout=0):
+    """One image_to_data pass: recognized words with boxes and confidences, and its run time"""
+    started = time.perf_counter()
+    pil_image = Image.fromarray(image) if isinstance(image, np.ndarray) else image
+    data = pytesseract.image_to_data(pil_image, config=config, timeout=timeout,
+                                     output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        conf = float(data['conf'][i])
+        if conf < 0 or not str(text).strip():
             continue
+        words.append({
+            'text': str(text).strip(),
+            'conf': conf,
+            'left': data['left'][i],
+            'top': data['top'][i],
+            'width': data['width'][i],
+            'height': data['height'][i]
+        })
+    return words, time.perf_counter() - started
+
+def run_tesseract_timed(image, config, timeout=0):
+    """run_tesseract returning (text, seconds), timed where it actually runs"""
+    started = time.perf_counter()
+    text = run_tesseract(image, config, timeout)
+    return text, time.perf_counter() - started
+
+def run_ocr_grid(variants, configs, deadline=None, order=None, stop_at=None,
+                 runner=None, score=None, keep=None):
+    """Run (preprocessing method, config) pairs on the shared executor.
+    
+    variants maps method name -> image; a PreprocessingPipeline only builds a
+    variant when its first pair is submitted.
+    Pairs run in grid order unless `order` lists them explicitly. With `stop_at`
+    set, the search ends as soon as one result scores that confidence.
+    `runner` (default run_tesseract_timed) returns (result, seconds) and
+    `score` rates a result and `keep` decides whether it is worth keeping; the
+    defaults work on plain text.
+    At most ocr_executor.max_workers calls of one scan are in flight at a time
+    (OCR_EARLY_EXIT_PARALLELISM with `stop_at`), so concurrent scans share the
+    pool instead of queueing behind each other.
+    Returns ({method: [(config, text), ...]}, stats); combinations_tried counts
+    every call that ran, including ones still in flight when the search ended.
+    """
+    deadline = OCR_SCAN_DEADLINE if deadline is None else deadline
+    expires = time.monotonic() + deadline
+    runner = runner or run_tesseract_timed
+    score = score or text_confidence
+    keep = keep or meaningful_text
+    if order is None:
+        order = [(method, config) for method in variants for config in configs]
+    queued = deque(order)
+    window = ocr_executor.max_workers
+    if stop_at is not None:
+        window = max(1, min(window, OCR_EARLY_EXIT_PARALLELISM))
+    in_flight = {}
+    texts = {}
+    tried = 0
+    timed_out = False
+    threshold_met = False
+    
+    try:
+        while (queued or in_flight) and not threshold_met:
+            while queued and len(in_flight) < window:
+                method, config = queued.popleft()
+                # Tesseract kills the subprocess itself once the scan deadline is reached
+                timeout = max(1, int(expires - time.monotonic()))
+                future = ocr_executor.submit(runner, variants[method], config, timeout)
+                in_flight[future] = (method, config)
+            
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            done, _ = wait(in_flight, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                method, config = in_flight.pop(future)
+                tried += 1
+                try:
+                    text, seconds = future.result()
+                except Exception as e:
+                    logger.warning(f"Config '{config}' failed on {method}: {e}")
+                    continue
+                metrics.observe('tesseract_seconds', seconds, config=config)
+                if text and keep(text):
+                    texts[(method, config)] = text
+                    preview = text if isinstance(text, str) else ' '.join(word['text'] for word in text)
+                    logger.info(f"[{method}] Config '{config}' extracted: {preview[:50]}...")
+                    if stop_at is not None and score(text) >= stop_at:
+                        threshold_met = True
+    finally:
+        for future in in_flight:
+            # Calls already running can't be cancelled and still cost their time
+            if not future.cancel():
+                tried += 1
     
-    return results
+    if timed_out:
+        logger.warning(f"OCR scan deadline of {deadline}s reached after {tried} combinations")
+    
+    results = {}
+    for method in variants:
+        method_results = [(config, texts[(method, config)]) for config in configs
+                          if (method, config) in texts]
+        if method_results:
+            results[method] = method_results
+    return results, {
+        'combinations_tried': tried,
+        'combinations_total': len(order),
+        'deadline_exceeded': timed_out,
+        'threshold_met': threshold_met
+    }
+
+def meaningful_text(text):
+    return len(text) > 2
+
+def text_confidence(text):
+    """Confidence of the plain-text extraction from one OCR result"""
+    return calculate_extraction_confidence(extract_numbers_and_text_from_text(text), text)
+
+def extract_text_with_multiple_configs(image):
+    """Try multiple Tesseract configurations for better results"""
+    myanmar, _ = detect_myanmar(image)
+    results, _ = run_ocr_grid({'image': image}, get_tesseract_configs(myanmar))
+    return results.get('image', [])
 
 def check_myanmar_support():
     """Check if Myanmar language is supported by Tesseract"""
-    try:
-        langs = pytesseract.get_languages()
-        return 'mya' in langs
-    except:
-        return False
+    return tesseract_runtime.has_language('mya')
 
 def extract_numbers_and_text_from_results(ocr_results):
     """Enhanced extraction from multiple OCR results"""
@@ -232,6 +2258,16 @@ def calculate_extraction_confidence(extraction, original_text):
     
     return score
 
+MYANMAR_DIGITS = str.maketrans('၀၁၂၃၄၅၆၇၈၉', '0123456789')
+# The letter wa (ဝ) is how OCR often reads a zero next to other digits
+MYANMAR_DIGIT_RUN = re.compile(r'[0-9၀-၉ဝ]*[0-9၀-၉][0-9၀-၉ဝ]*')
+
+def normalize_digits(text):
+    """Turn Myanmar digits (U+1040-1049) into ASCII so prices parse like Latin ones"""
+    text = MYANMAR_DIGIT_RUN.sub(lambda m: m.group().replace('ဝ', '0'), text)
+    return text.translate(MYANMAR_DIGITS)
+
+@metrics.timed('extract_text_seconds')
 def extract_numbers_and_text_from_text(ocr_text):
     """Extract meaningful information from OCR results text"""
     extracted_info = {
@@ -244,6 +2280,8 @@ def extract_numbers_and_text_from_text(ocr_text):
     if not ocr_text or not ocr_text.strip():
         return extracted_info
     
+    ocr_text = normalize_digits(ocr_text)
+    
     lines = [line.strip() for line in ocr_text.split('\n') if line.strip()]
     
     # Extract all text and numbers
@@ -286,7 +2324,7 @@ def extract_numbers_and_text_from_text(ocr_text):
         
         if len(sorted_numbers) >= 2:
             extracted_info['price'] = str(sorted_numbers[1])
-            
+        
         if len(sorted_numbers) >= 3:
             extracted_info['quantity'] = str(sorted_numbers[2])
         elif len(sorted_numbers) == 2:
@@ -300,14 +2338,854 @@ def extract_numbers_and_text_from_text(ocr_text):
     
     return extracted_info
 
+# Words that label a field on price tags and receipts
+LAYOUT_LABELS = {
+    field: re.compile(rf'^(?:{words})[:.\-]*(?=$|\d)', re.IGNORECASE) for field, words in {
+        'price': 'price|rate|each|mrp|ဈေးနှုန်း|စျေးနှုန်း|ဈေး|စျေး',
+        'quantity': 'qty|quantity|pcs|units?|count|အရေအတွက်',
+        'total': 'total|amount|amt|sum|net|စုစုပေါင်း'
+    }.items()
+}
+# Weight of each field in the layout confidence; the remainder rewards price x qty == total
+LAYOUT_WEIGHTS = {'item_name': 30, 'price': 25, 'quantity': 20, 'total': 15}
+NUMBER_PATTERN = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+def parse_number(text):
+    """First number in text as a float, or None"""
+    match = NUMBER_PATTERN.search(normalize_digits(text))
+    if not match:
+        return None
+    try:
+        return float(match.group().replace(',', ''))
+    except ValueError:
+        return None
+
+def format_number(value):
+    return str(int(value)) if float(value).is_integer() else str(round(value, 2))
+
+def group_word_lines(words):
+    """Group word boxes into text lines by vertical overlap, each sorted left to right"""
+    lines = []
+    for word in sorted(words, key=lambda w: w['top']):
+        center = word['top'] + word['height'] / 2
+        for line in lines:
+            if line['top'] <= center <= line['bottom']:
+                line['words'].append(word)
+                line['bottom'] = max(line['bottom'], word['top'] + word['height'])
+                break
+        else:
+            lines.append({'top': word['top'], 'bottom': word['top'] + word['height'], 'words': [word]})
+    for line in lines:
+        line['words'].sort(key=lambda w: w['left'])
+    return [line['words'] for line in lines]
+
+def extract_fields_from_words(words):
+    """Read item fields from Tesseract word boxes.
+    
+    Numbers are tied to the label (price, qty, total...) on their left or
+    right above them; missing fields are completed from price x qty = total.
+    Each field's confidence is Tesseract's word confidence scaled by how the
+    value was found (label, arithmetic, guess), and the overall confidence
+    weighs fields like calculate_extraction_confidence, so thresholds carry over.
+    """
+    lines = group_word_lines(words)
+    fields = {}
+    used = set()
+    
+    def assign(field, word, evidence, conf=None):
+        if field in fields and field != 'total':
+            return
+        fields[field] = (word['number'], evidence, word['conf'] if conf is None else conf)
+        used.add(id(word))
+    
+    for line in lines:
+        for word in line:
+            word['number'] = parse_number(word['text'])
+            word['label'] = next((field for field, pattern in LAYOUT_LABELS.items()
+                                  if pattern.match(word['text'])), None)
+    
+    for index, line in enumerate(lines):
+        for position, word in enumerate(line):
+            if word['label'] is None:
+                continue
+            if word['number'] is not None:
+                # 'Price:1500' read as one word
+                assign(word['label'], word, 1.0)
+                continue
+            # The nearest number to the right, otherwise just below the label
+            value = next((w for w in line[position + 1:] if w['number'] is not None and id(w) not in used), None)
+            if value is None and index + 1 < len(lines):
+                below = [w for w in lines[index + 1] if w['number'] is not None and id(w) not in used
+                         and w['left'] < word['left'] + word['width'] * 2
+                         and w['left'] + w['width'] > word['left'] - word['width']]
+                value = below[0] if below else None
+            if value is not None:
+                assign(word['label'], value, 1.0, min(word['conf'], value['conf']))
+        # '3 x 1500'
+        for position in range(1, len(line) - 1):
+            if line[position]['text'].lower() in ('x', '×', '@', '*'):
+                left, right = line[position - 1], line[position + 1]
+                if left['number'] is not None and right['number'] is not None:
+                    assign('quantity', left, 0.9)
+                    assign('price', right, 0.9)
+    
+    loose = [w for line in lines for w in line if w['number'] is not None and id(w) not in used]
+    
+    def close(a, b):
+        return abs(a - b) <= max(0.01, 0.005 * abs(b))
+    
+    if not fields:
+        # No labels: look for qty * price == total among the numbers
+        for total in sorted(loose, key=lambda w: -w['number']):
+            for quantity in loose:
+                for price in loose:
+                    if len({id(total), id(quantity), id(price)}) == 3 and quantity['number'] <= price['number'] \
+                            and float(quantity['number']).is_integer() \
+                            and close(quantity['number'] * price['number'], total['number']):
+                        assign('total', total, 0.8)
+                        assign('quantity', quantity, 0.8)
+                        assign('price', price, 0.8)
+                        break
+                if fields:
+                    break
+            if fields:
+                break
+    if 'total' not in fields and 'price' in fields and 'quantity' in fields:
+        product = fields['price'][0] * fields['quantity'][0]
+        match = next((w for w in loose if id(w) not in used and close(w['number'], product)), None)
+        if match is not None:
+            assign('total', match, 0.9)
+        else:
+            fields['total'] = (product, 0.6, min(fields['price'][2], fields['quantity'][2]))
+    if 'total' in fields and fields['total'][0]:
+        total, _, total_conf = fields['total']
+        if 'price' in fields and 'quantity' not in fields and fields['price'][0]:
+            quantity = total / fields['price'][0]
+            if quantity.is_integer():
+                fields['quantity'] = (quantity, 0.7, min(total_conf, fields['price'][2]))
+        elif 'quantity' in fields and 'price' not in fields and fields['quantity'][0]:
+            fields['price'] = (total / fields['quantity'][0], 0.7, min(total_conf, fields['quantity'][2]))
+    if not fields and loose:
+        # Guess like the plain-text extraction: largest is the total, next the price
+        ranked = sorted(loose, key=lambda w: -w['number'])
+        assign('total', ranked[0], 0.4)
+        if len(ranked) > 1:
+            assign('price', ranked[1], 0.4)
+    
+    # Name: the first confident line of words that are neither labels nor numbers
+    name_words = []
+    for line in lines:
+        text_words = [w for w in line if w['label'] is None and w['number'] is None
+                      and sum(ch.isalpha() for ch in w['text']) >= 1]
+        letters = sum(ch.isalpha() for w in text_words for ch in w['text'])
+        if letters >= 3 and not any(w['label'] for w in line):
+            name_words = text_words
+            if sum(w['conf'] for w in text_words) / len(text_words) >= 50:
+                break
+    
+    extracted = {'item_name': '', 'price': '', 'quantity': '', 'total': ''}
+    field_confidence = {}
+    confidence = 0.0
+    if name_words:
+        extracted['item_name'] = ' '.join(w['text'] for w in name_words)
+        field_confidence['item_name'] = round(sum(w['conf'] for w in name_words) / len(name_words), 1)
+        confidence += LAYOUT_WEIGHTS['item_name'] * 0.9 * field_confidence['item_name'] / 100
+    for field in ('price', 'quantity', 'total'):
+        if field in fields and fields[field][0]:
+            value, evidence, conf = fields[field]
+            extracted[field] = format_number(value)
+            field_confidence[field] = round(evidence * conf, 1)
+            confidence += LAYOUT_WEIGHTS[field] * evidence * conf / 100
+    if all(field in fields for field in ('price', 'quantity', 'total')) and \
+            close(fields['price'][0] * fields['quantity'][0], fields['total'][0]):
+        confidence += 100 - sum(LAYOUT_WEIGHTS.values())
+    
+    return {
+        **extracted,
+        'confidence': int(round(confidence)),
+        'field_confidence': field_confidence,
+        'raw_text': '\n'.join(' '.join(w['text'] for w in line) for line in lines)
+    }
+
+# Receipt lines that are totals/payments rather than items
+RECEIPT_SKIP_PATTERN = re.compile(
+    r'\b(?:sub\s*total|total|tax|vat|cash|change|discount|balance|paid)\b|စုစုပေါင်း', re.IGNORECASE)
+
+def parse_receipt_line(text):
+    """Parse one receipt line like 'Rice Bag 3 x 1500 4500' into an item.
+    
+    Returns {'name', 'quantity', 'price', 'total'} or None when the line has
+    no name or no amount, or is a total/payment line.
+    """
+    text = normalize_digits(' '.join(text.split()))
+    if RECEIPT_SKIP_PATTERN.search(text):
+        return None
+    
+    match = re.search(r'\d[\d,]*(?:\.\d+)?', text)
+    if not match:
+        return None
+    name = text[:match.start()].strip(' .:-*#')
+    if len(name) < 2:
+        return None
+    numbers = [float(n.replace(',', '')) for n in re.findall(r'\d[\d,]*(?:\.\d+)?', text[match.start():])]
+    
+    quantity_price = re.search(r'(\d+(?:\.\d+)?)\s*[xX*@]\s*(\d[\d,]*(?:\.\d+)?)', text)
+    if quantity_price:
+        quantity = float(quantity_price.group(1))
+        price = float(quantity_price.group(2).replace(',', ''))
+        total = numbers[-1] if len(numbers) > 2 else quantity * price
+    elif len(numbers) >= 3:
+        quantity, price, total = numbers[-3:]
+        # 'price qty total' is as common as 'qty price total'; the quantity is the smaller
+        if price < quantity and price == int(price):
+            quantity, price = price, quantity
+    elif len(numbers) == 2 and numbers[0] == int(numbers[0]) and 0 < numbers[0] < numbers[1]:
+        # 'qty total'
+        quantity, total = numbers
+        price = total / quantity
+    else:
+        quantity, price, total = 1, numbers[-1], numbers[-1]
+    
+    return {'name': name, 'quantity': quantity, 'price': price, 'total': total}
+
+class TesseractEngine:
+    """Tesseract via pytesseract: the variant/config grid on the shared executor"""
+    name = 'tesseract'
+    
+    def info(self):
+        return {'ready': tesseract_runtime.installed}
+    
+    def recognize(self, pipeline, search, myanmar):
+        """Run the search; returns ({method: [(config, text or words)]}, stats)"""
+        configs = get_tesseract_configs(myanmar)
+        if search == 'layout':
+            config = with_myanmar(OCR_LAYOUT_CONFIG) if myanmar else OCR_LAYOUT_CONFIG
+            return run_ocr_grid(pipeline, [config],
+                                order=ocr_win_stats.order([(method, config) for method in pipeline]),
+                                stop_at=OCR_LAYOUT_THRESHOLD, runner=run_tesseract_words,
+                                score=lambda words: extract_fields_from_words(words)['confidence'],
+                                keep=bool)
+        if search == 'adaptive':
+            grid = [(method, config) for method in pipeline for config in configs]
+            return run_ocr_grid(pipeline, configs, order=ocr_win_stats.order(grid),
+                                stop_at=OCR_CONFIDENCE_THRESHOLD)
+        return run_ocr_grid(pipeline, configs)
+
+class EasyOCREngine:
+    """EasyOCR reader loaded once per process on CPU and kept warm.
+    
+    All preprocessing variants of a scan (they share one size) go through
+    readtext_batched as a single inference call. Calls are serialized: torch
+    already spreads one batch over the cores.
+    """
+    name = 'easyocr'
+    
+    def __init__(self, languages):
+        self.languages = languages
+        self._reader = None
+        self._error = None
+        self._preloading = False
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+    
+    def preload(self):
+        """Load the model and run a warm-up inference on a background thread (once)"""
+        with self._load_lock:
+            if self._preloading:
+                return
+            self._preloading = True
+        threading.Thread(target=self._load, name='easyocr-preload', daemon=True).start()
+    
+    def _load(self):
+        with self._load_lock:
+            if self._reader is not None or self._error is not None:
+                return self._reader
+            started = time.perf_counter()
+            try:
+                import easyocr
+                reader = easyocr.Reader(self.languages, gpu=False, verbose=False)
+                reader.readtext(np.full((32, 96), 255, np.uint8))
+                self._reader = reader
+                logger.info(f"EasyOCR {self.languages} ready in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                self._error = str(e)
+                logger.warning(f"EasyOCR unavailable: {e}")
+            return self._reader
+    
+    def info(self):
+        """Load state without triggering a load"""
+        return {'ready': self._reader is not None, 'languages': self.languages, 'error': self._error}
+    
+    @staticmethod
+    def _word(box, text, conf):
+        xs = [point[0] for point in box]
+        ys = [point[1] for point in box]
+        return {'text': text.strip(), 'conf': float(conf) * 100,
+                'left': int(min(xs)), 'top': int(min(ys)),
+                'width': int(max(xs) - min(xs)), 'height': int(max(ys) - min(ys))}
+    
+    def recognize(self, pipeline, search, myanmar):
+        """Read every variant in one batch; same result shape as TesseractEngine"""
+        reader = self._load()
+        if reader is None:
+            raise RuntimeError(f"EasyOCR unavailable: {self._error}")
+        methods = list(pipeline)
+        images = [pipeline[method] for method in methods]
+        started = time.perf_counter()
+        with self._lock:
+            batch = reader.readtext_batched(images, batch_size=len(images))
+        metrics.observe('easyocr_seconds', time.perf_counter() - started)
+        
+        results = {}
+        for method, detections in zip(methods, batch):
+            words = [self._word(box, text, conf) for box, text, conf in detections if text.strip()]
+            if not words:
+                continue
+            if search == 'layout':
+                results[method] = [(self.name, words)]
+            else:
+                lines = group_word_lines(words)
+                results[method] = [(self.name, '\n'.join(' '.join(w['text'] for w in line) for line in lines))]
+        return results, {
+            'combinations_tried': len(methods),
+            'combinations_total': len(methods),
+            'deadline_exceeded': False,
+            'threshold_met': False
+        }
+
+OCR_ENGINES = {
+    'tesseract': TesseractEngine(),
+    'easyocr': EasyOCREngine(EASYOCR_LANGUAGES)
+}
+# Runs the engines of a 'vote' scan side by side
+ocr_engine_pool = ThreadPoolExecutor(max_workers=len(OCR_ENGINES), thread_name_prefix='ocr-engine')
+
+def get_engine(options):
+    """Validated OCR engine from request options (None for the default)"""
+    engine = options.get('engine')
+    if engine and engine not in OCR_ENGINES and engine != 'vote':
+        raise ValueError(f'Unknown OCR engine: {engine}')
+    return engine
+
+def best_extraction(grid_results, pipeline, search):
+    """Best extraction over the preprocessing methods of one engine's results"""
+    all_ocr_results = []
+    best_result = None
+    best_confidence = 0
+    
+    for method_name in pipeline:
+        ocr_results = grid_results.get(method_name)
+        
+        if ocr_results:
+            # Get best extraction from this preprocessing method
+            if search == 'layout':
+                config, words = ocr_results[0]
+                extraction = {**extract_fields_from_words(words), 'config': config}
+                ocr_results = [(config, extraction['raw_text'])]
+            else:
+                extraction = extract_numbers_and_text_from_results(ocr_results)
+            extraction['preprocessing_method'] = method_name
+            all_ocr_results.append({
+                'method': method_name,
+                'results': ocr_results,
+                'extraction': extraction
+            })
+            
+            # Track best overall result
+            if extraction['confidence'] > best_confidence:
+                best_confidence = extraction['confidence']
+                best_result = extraction
+    return best_result, all_ocr_results
+
+def vote_extractions(extractions):
+    """Merge the best extraction of each engine field by field.
+    
+    Each field takes the value backed by the most engine confidence. Fields
+    the engines agree on lift the overall confidence toward 100.
+    """
+    def key(field, value):
+        if field == 'item_name':
+            return ' '.join(str(value).casefold().split())
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+    
+    best = max(extractions, key=lambda e: e['confidence'])
+    voted = {}
+    present = agreed = 0
+    for field in ('item_name', 'price', 'quantity', 'total'):
+        support = {}
+        for extraction in extractions:
+            value = extraction.get(field, '')
+            if value != '':
+                entry = support.setdefault(key(field, value), [0, value, 0])
+                entry[0] += extraction['confidence']
+                entry[2] += 1
+        if not support:
+            voted[field] = ''
+            continue
+        present += 1
+        _, value, votes = max(support.values(), key=lambda entry: entry[0])
+        voted[field] = value
+        if votes > 1:
+            agreed += 1
+    confidence = best['confidence'] + (100 - best['confidence']) * agreed / max(present, 1) / 2
+    return {
+        **voted,
+        'confidence': int(round(confidence)),
+        'preprocessing_method': best['preprocessing_method'],
+        'config': best['config'],
+        'raw_text': best.get('raw_text', '')
+    }
+
+def scan_image(opencv_image, search=None, engine=None):
+    """Run preprocessing + OCR on a decoded image and build the scan response.
+    
+    search is 'exhaustive' (whole grid), 'adaptive' (past winners first, stop
+    at OCR_CONFIDENCE_THRESHOLD) or 'layout'; defaults to OCR_SEARCH_MODE.
+    engine is 'tesseract', 'easyocr' or 'vote' (both, merged field by field);
+    defaults to OCR_ENGINE.
+    """
+    search = search or OCR_SEARCH_MODE
+    engine = engine or OCR_ENGINE
+    
+    if ocr_result_cache:
+        cache_key = OCRResultCache.image_key(opencv_image, engine, search)
+        phash = OCRResultCache.perceptual_hash(opencv_image)
+        cached, match = ocr_result_cache.get(cache_key, phash)
+        if cached:
+            logger.info(f"OCR cache hit ({match})")
+            return {
+                **cached,
+                'debug_info': {**cached['debug_info'], 'cache': {'hit': True, 'match': match,
+                                                                 **ocr_result_cache.stats()}}
+            }
+    
+    # Variants are only built when the OCR search first asks for them
+    pipeline = PreprocessingPipeline(opencv_image)
+    
+    # Script detection on the cropped text region decides whether mya is loaded
+    myanmar, script_info = detect_myanmar(pipeline['original'])
+    
+    names = list(OCR_ENGINES) if engine == 'vote' else [engine]
+    if len(names) == 1:
+        calls = {engine: lambda: OCR_ENGINES[engine].recognize(pipeline, search, myanmar)}
+    else:
+        futures = {name: ocr_engine_pool.submit(OCR_ENGINES[name].recognize, pipeline, search, myanmar)
+                   for name in names}
+        calls = {name: future.result for name, future in futures.items()}
+    runs = {}
+    engine_info = {}
+    for name, call in calls.items():
+        try:
+            runs[name] = call()
+        except Exception as e:
+            # A missing engine degrades to the other one (or the basic fallback)
+            logger.warning(f"OCR engine {name} failed: {e}")
+            metrics.inc('fallbacks_total', route=current_route(), kind=f'{name}_failed')
+            engine_info[name] = {'confidence': 0, 'error': str(e)}
+    logger.info(f"Built {len(pipeline.computed_variants)} processed image variants")
+    
+    all_ocr_results = []
+    engine_results = {}
+    grid_stats = {'combinations_tried': 0, 'combinations_total': 0, 'deadline_exceeded': False}
+    for name, (grid_results, stats) in runs.items():
+        result, ocr_results = best_extraction(grid_results, pipeline, search)
+        all_ocr_results.extend(ocr_results)
+        grid_stats['combinations_tried'] += stats['combinations_tried']
+        grid_stats['combinations_total'] += stats['combinations_total']
+        grid_stats['deadline_exceeded'] |= stats['deadline_exceeded']
+        engine_info[name] = {'confidence': result['confidence'] if result else 0,
+                             'combinations_tried': stats['combinations_tried']}
+        if result and result['confidence'] > 0:
+            engine_results[name] = result
+    
+    if len(engine_results) > 1:
+        best_result = vote_extractions(list(engine_results.values()))
+    else:
+        best_result = next(iter(engine_results.values()), None)
+    best_confidence = best_result['confidence'] if best_result else 0
+    
+    # Fallback if no good results
+    if not best_result or best_confidence == 0:
+        logger.warning("No meaningful OCR results found, trying basic extraction")
+        metrics.inc('fallbacks_total', route=current_route(), kind='basic_ocr')
+        try:
+            basic_text, seconds = run_tesseract_timed(pipeline['original'], '')
+            metrics.observe('tesseract_seconds', seconds, config='basic')
+            best_result = extract_numbers_and_text_from_text(basic_text)
+            best_result['preprocessing_method'] = 'fallback'
+            best_result['config'] = 'basic'
+            best_result['raw_text'] = basic_text
+        except Exception as e:
+            logger.error(f"Fallback OCR failed: {e}")
+            best_result = {
+                'item_name': '',
+                'price': '',
+                'quantity': '',
+                'total': '',
+                'confidence': 0,
+                'preprocessing_method': 'failed',
+                'config': 'none',
+                'raw_text': ''
+            }
+    
+    response = {
+        'success': True,
+        'extracted': {
+            'item_name': best_result.get('item_name', ''),
+            'price': best_result.get('price', ''),
+            'quantity': best_result.get('quantity', ''),
+            'total': best_result.get('total', '')
+        },
+        'confidence': best_result.get('confidence', 0),
+        'method_used': best_result.get('preprocessing_method', 'unknown'),
+        'config_used': best_result.get('config', 'unknown'),
+        'engine_used': engine,
+        'raw_text': best_result.get('raw_text', ''),
+        'debug_info': {
+            'methods_tried': len(pipeline.computed_variants),
+            'total_extractions': len(all_ocr_results),
+            'best_confidence': best_confidence,
+            'search_mode': search,
+            'combinations_tried': grid_stats['combinations_tried'],
+            'combinations_total': grid_stats['combinations_total'],
+            'deadline_exceeded': grid_stats['deadline_exceeded'],
+            'text_region': pipeline.text_region,
+            'preprocessing_ms': pipeline.timings,
+            'script': {**script_info, 'myanmar': myanmar},
+            'engines': engine_info
+        }
+    }
+    
+    if 'field_confidence' in best_result:
+        response['debug_info']['field_confidence'] = best_result['field_confidence']
+    
+    if best_confidence > 0:
+        ocr_win_stats.record(best_result['preprocessing_method'], best_result['config'])
+        if ocr_result_cache:
+            ocr_result_cache.put(cache_key, phash, {**response, 'debug_info': dict(response['debug_info'])})
+    if ocr_result_cache:
+        response['debug_info']['cache'] = {'hit': False, **ocr_result_cache.stats()}
+    
+    logger.info(f"OCR completed. Best confidence: {best_confidence}, Method: {best_result.get('preprocessing_method')}")
+    return response
+
+def scan_receipt(opencv_image, date=None, category='other'):
+    """Split a receipt into text lines, OCR the lines in parallel and parse items.
+    
+    Returns items shaped for POST /api/items/bulk, plus per-line details.
+    """
+    pipeline = PreprocessingPipeline(opencv_image)
+    gray = pipeline['original']
+    bands = segment_text_lines(pipeline['otsu_threshold'])
+    
+    variants = {}
+    for index, (y0, y1) in enumerate(bands):
+        crop = gray[y0:y1]
+        # Tesseract reads best with glyphs at least ~20px tall
+        if y1 - y0 < 32:
+            crop = cv2.resize(crop, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        variants[f'line_{index}'] = crop
+    
+    myanmar, _ = detect_myanmar(gray)
+    configs = [with_myanmar(RECEIPT_LINE_CONFIG) if myanmar else RECEIPT_LINE_CONFIG]
+    grid_results, grid_stats = run_ocr_grid(variants, configs)
+    
+    items, lines, skipped = [], [], []
+    for index, (y0, y1) in enumerate(bands):
+        results = grid_results.get(f'line_{index}')
+        if not results:
+            continue
+        text = results[0][1]
+        parsed = parse_receipt_line(text)
+        line = {'index': index, 'top': y0, 'bottom': y1, 'text': text}
+        if parsed is None:
+            skipped.append(line)
+            continue
+        item = {
+            'name': parsed['name'],
+            'price': parsed['price'],
+            'unitsSold': parsed['quantity'],
+            'category': category,
+            'unit': 'pcs'
+        }
+        if date:
+            item['date'] = date
+        items.append(item)
+        lines.append({**line, 'total': parsed['total']})
+    
+    logger.info(f"Receipt scan: {len(bands)} lines, {len(items)} items")
+    return {
+        'success': True,
+        'items': items,
+        'lines': lines,
+        'skipped_lines': skipped,
+        'debug_info': {
+            'lines_detected': len(bands),
+            'combinations_tried': grid_stats['combinations_tried'],
+            'deadline_exceeded': grid_stats['deadline_exceeded'],
+            'text_region': pipeline.text_region,
+            'preprocessing_ms': pipeline.timings
+        }
+    }
+
+class OCRJobQueue:
+    """Bounded queue of scans served by dedicated worker threads.
+    
+    Request threads only decode and enqueue, so the CRUD routes stay
+    responsive while OCR is saturated.
+    """
+    def __init__(self, workers=2, max_queued=32, ttl=600):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        # Moving average of scan duration, used for Retry-After hints
+        self._avg_seconds = 5.0
+    
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'ocr-job-{len(self._threads)}',
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def submit(self, opencv_image, image_size, search=None, engine=None):
+        """Queue a scan and return its job id; raises queue.Full when saturated"""
+        job_id = uuid.uuid4().hex
+        job = {'job_id': job_id, 'status': 'queued', 'created': time.time()}
+        with self._lock:
+            self._start()
+            self._expire()
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, opencv_image, image_size, search, engine))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise
+        return job_id
+    
+    def retry_after(self):
+        """Seconds a rejected client should wait before resubmitting"""
+        return max(1, int(self._queue.qsize() * self._avg_seconds / self.workers))
+    
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.get('finished', float('inf')) < cutoff]:
+            del self._jobs[job_id]
+    
+    def _work(self):
+        while True:
+            job_id, opencv_image, image_size, search, engine = self._queue.get()
+            job = self._jobs.get(job_id)
+            started = time.monotonic()
+            try:
+                job['status'] = 'running'
+                result = scan_image(opencv_image, search=search, engine=engine)
+                result['image_size'] = image_size
+                job['result'] = result
+                job['status'] = 'done'
+            except Exception as e:
+                logger.error(f"OCR job {job_id} failed: {e}", exc_info=True)
+                job['error'] = str(e)
+                job['status'] = 'failed'
+            finally:
+                job['finished'] = time.time()
+                elapsed = time.monotonic() - started
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+                self._queue.task_done()
+    
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = {'job_id': job_id, 'status': job['status']}
+            if 'result' in job:
+                status['result'] = job['result']
+            if 'error' in job:
+                status['error'] = job['error']
+            if job['status'] == 'queued':
+                status['queue_depth'] = self._queue.qsize()
+            return status
+
+ocr_job_queue = OCRJobQueue(OCR_JOB_WORKERS, OCR_JOB_QUEUE_SIZE, OCR_JOB_TTL)
+
+class ItemsBodyCache:
+    """Serialized GET /api/items/<date> bodies, keyed by the day's version"""
+    def __init__(self, size=32):
+        self.size = size
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, date, version):
+        with self._lock:
+            cached = self._bodies.get(date)
+            if cached is None or cached[0] != version:
+                return None
+            self._bodies.move_to_end(date)
+            return cached[1]
+    
+    def put(self, date, version, body):
+        with self._lock:
+            self._bodies[date] = (version, body)
+            self._bodies.move_to_end(date)
+            while len(self._bodies) > self.size:
+                self._bodies.popitem(last=False)
+
+items_body_cache = ItemsBodyCache(ITEMS_BODY_CACHE_SIZE)
+
+def day_etag(date, version):
+    return f"{date}-v{version}"
+
+def build_item(data):
+    """Turn an item payload into (date, item), computing totalAmount; raises ValueError for a bad date"""
+    date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
+    if not is_iso_date(date):
+        raise ValueError(f'date must be YYYY-MM-DD: {date}')
+    price = float(data.get('price', 0))
+    units_sold = float(data.get('unitsSold', 0))
+    total_amount = price * units_sold
+    item = {
+        'name': data.get('name', ''),
+        'price': price,
+        'unitsSold': units_sold,
+        'totalAmount': total_amount,
+        'category': data.get('category', 'other'),
+        'unit': data.get('unit', 'pcs'),
+        'date': date
+    }
+    return date, item
+
+metrics.gauge('inventory_items_in_memory', 'Items held in memory by the inventory manager',
+              lambda: inventory_manager.memory_item_count())
+metrics.gauge('inventory_items_total', 'Items over all retained days',
+              lambda: inventory_manager.summarize()['total_items'])
+metrics.gauge('inventory_data_bytes', 'Size of the inventory data on disk',
+              lambda: inventory_manager.storage.size())
+metrics.gauge('inventory_archive_bytes', 'Size of the columnar archive of expired days',
+              lambda: inventory_manager.archive.size() if inventory_manager.archive else 0)
+
+def init_server():
+    """Per-process server state: the data store, the Tesseract probe and the EasyOCR preload.
+    
+    Runs from serve() and before every request (a no-op once done), never on
+    import, so OCR pool workers don't repeat any of it.
+    """
+    init_inventory_manager()
+    tesseract_runtime.state
+    if EASYOCR_PRELOAD:
+        OCR_ENGINES['easyocr'].preload()
+
+@app.before_request
+def ensure_server_state():
+    init_server()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    route = current_route() if request.url_rule is not None else 'unmatched'
+    metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        metrics.inc('http_request_errors_total', route=route)
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started, route=route)
+    return response
+
 # API Routes (keeping existing ones, updating OCR route)
 
 @app.route('/api/items/<date>', methods=['GET'])
 def get_items(date):
-    """Get items for specific date"""
+    """Get items for specific date (ETag/If-None-Match aware)"""
     try:
-        items = inventory_manager.get_items_by_date(date)
-        return jsonify({'items': items, 'count': len(items)})
+        version = inventory_manager.get_day_version(date)
+        etag = day_etag(date, version)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            body = items_body_cache.get(date, version)
+            if body is None:
+                items, version = inventory_manager.get_items_versioned(date)
+                etag = day_etag(date, version)
+                body = app.json.dumps({'items': items, 'count': len(items), 'version': version})
+                items_body_cache.put(date, version, body)
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/items/<date>/changes', methods=['GET'])
+def get_item_changes(date):
+    """Items changed and ids deleted on a date since ?since=<version>"""
+    try:
+        try:
+            since = int(request.args.get('since', 0))
+        except ValueError:
+            return jsonify({'error': 'since must be an integer version'}), 400
+        changes = inventory_manager.get_changes(date, since)
+        return jsonify({'date': date, 'since': since, **changes})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_date_param(name):
+    """Optional YYYY-MM-DD query parameter; raises ValueError when malformed"""
+    value = request.args.get(name)
+    if value:
+        datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+@app.route('/api/items', methods=['GET'])
+def query_items():
+    """Items over a date range: ?from=&to=&category=&cursor=&limit=
+    
+    Returns a page and a next_cursor to pass back as `cursor`. With
+    ?format=ndjson (or Accept: application/x-ndjson) the whole range is
+    streamed one item per line, fetched page by page.
+    """
+    try:
+        try:
+            date_from, date_to = parse_date_param('from'), parse_date_param('to')
+            limit = int(request.args.get('limit', QUERY_PAGE_SIZE))
+            if limit <= 0:
+                raise ValueError('limit must be positive')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        category = request.args.get('category')
+        cursor = request.args.get('cursor')
+        
+        if request.args.get('format') == 'ndjson' or \
+                request.accept_mimetypes.best == 'application/x-ndjson':
+            # An explicit limit caps the stream; otherwise the whole range is sent
+            remaining = limit if 'limit' in request.args else None
+            
+            def generate(after, remaining):
+                while remaining is None or remaining > 0:
+                    page_size = QUERY_PAGE_SIZE if remaining is None else min(remaining, QUERY_PAGE_SIZE)
+                    items, after = inventory_manager.query_items(date_from, date_to, category,
+                                                                 after, page_size)
+                    for item in items:
+                        yield json.dumps(item, ensure_ascii=False) + '\n'
+                    if remaining is not None:
+                        remaining -= len(items)
+                    if after is None:
+                        break
+            return Response(generate(cursor, remaining), mimetype='application/x-ndjson')
+        
+        items, next_cursor = inventory_manager.query_items(date_from, date_to, category, cursor,
+                                                           min(limit, QUERY_MAX_PAGE_SIZE))
+        return jsonify({'items': items, 'count': len(items), 'next_cursor': next_cursor})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -316,22 +3194,44 @@ def add_item():
     """Add new item"""
     try:
         data = request.get_json()
-        date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
-        price = float(data.get('price', 0))
-        units_sold = float(data.get('unitsSold', 0))
-        total_amount = price * units_sold
-        item = {
-            'name': data.get('name', ''),
-            'price': price,
-            'unitsSold': units_sold,
-            'totalAmount': total_amount,
-            'category': data.get('category', 'other'),
-            'unit': data.get('unit', 'pcs'),
-            'date': date
-        }
+        try:
+            date, item = build_item(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
         added_item = inventory_manager.add_item(date, item)
-        items = inventory_manager.get_items_by_date(date)
-        return jsonify({'success': True, 'item': added_item, 'items': items})
+        # Only the change goes back; clients that see a version gap fetch /changes
+        return jsonify({'success': True, 'item': added_item,
+                        'version': inventory_manager.get_day_version(date)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/items/bulk', methods=['POST'])
+def add_items_bulk():
+    """Add many items, possibly over several dates, with a single save"""
+    try:
+        data = request.get_json(silent=True)
+        entries = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'error': 'Expected a non-empty list of items'}), 400
+        if len(entries) > BULK_MAX_ITEMS:
+            return jsonify({'error': f'At most {BULK_MAX_ITEMS} items per request'}), 400
+        
+        built, errors = [], []
+        for index, entry in enumerate(entries):
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError('item must be an object')
+                date, item = build_item(entry)
+                built.append((date, item))
+            except (TypeError, ValueError) as e:
+                errors.append({'index': index, 'error': str(e)})
+        if errors:
+            return jsonify({'error': 'Invalid items', 'details': errors}), 400
+        
+        added = inventory_manager.add_items(built)
+        versions = {date: inventory_manager.get_day_version(date) for date in {date for date, _ in built}}
+        return jsonify({'success': True, 'count': len(added), 'ids': [item['id'] for item in added],
+                        'versions': versions})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -340,15 +3240,10 @@ def update_item(date, item_id):
     """Update existing item"""
     try:
         data = request.get_json()
-        if 'price' in data or 'unitsSold' in data:
-            items = inventory_manager.get_items_by_date(date)
-            current_item = next((item for item in items if item['id'] == item_id), {})
-            price = float(data.get('price', current_item.get('price', 0)))
-            units_sold = float(data.get('unitsSold', current_item.get('unitsSold', 0)))
-            data['totalAmount'] = price * units_sold
         updated_item = inventory_manager.update_item(date, item_id, data)
         if updated_item:
-            return jsonify({'success': True, 'item': updated_item})
+            return jsonify({'success': True, 'item': updated_item,
+                            'version': inventory_manager.get_day_version(date)})
         else:
             return jsonify({'error': 'Item not found'}), 404
     except Exception as e:
@@ -360,8 +3255,8 @@ def delete_item(date, item_id):
     try:
         success = inventory_manager.delete_item(date, item_id)
         if success:
-            items = inventory_manager.get_items_by_date(date)
-            return jsonify({'success': True, 'items': items})
+            return jsonify({'success': True, 'deleted': item_id,
+                            'version': inventory_manager.get_day_version(date)})
         else:
             return jsonify({'error': 'Item not found'}), 404
     except Exception as e:
@@ -370,114 +3265,105 @@ def delete_item(date, item_id):
 @app.route('/api/ocr/scan', methods=['POST'])
 def ocr_scan():
     """Enhanced OCR processing with multiple preprocessing methods"""
-    print("11111111111111")
     try:
-        data = request.get_json()
-        logger.info(f"Received OCR request with keys: {list(data.keys()) if data else None}")
-        
-        if 'image' not in data:
-            return jsonify({'error': 'No image provided', 'success': False}), 400
+        try:
+            image_bytes, options = read_scan_request()
+            search = get_search_mode(options)
+            engine = get_engine(options)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'success': False}), 400
         
         # Decode image
         try:
-            print("we are decoding image: 111111111")
-            image_data = base64.b64decode(data['image'])
-            image = Image.open(io.BytesIO(image_data))
-            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            opencv_image, image_size = decode_image_bytes(image_bytes)
             logger.info(f"Image decoded successfully. Size: {opencv_image.shape}")
         except Exception as e:
             logger.error(f"Image decoding error: {e}")
             return jsonify({'error': f'Invalid image data: {str(e)}', 'success': False}), 400
         
-        # Preprocess image with multiple methods
-        processed_images = preprocess_image_for_ocr(opencv_image)
-        logger.info(f"Generated {len(processed_images)} processed image variants")
-        
-        all_ocr_results = []
-        best_result = None
-        best_confidence = 0
+        response = scan_image(opencv_image, search=search, engine=engine)
+        response['image_size'] = image_size
         
-        # Try OCR on each preprocessed image
-        for method_name, processed_img in processed_images:
-            logger.info(f"Trying OCR with {method_name} preprocessing...")
-            ocr_results = extract_text_with_multiple_configs(processed_img)
-            
-            if ocr_results:
-                # Get best extraction from this preprocessing method
-                extraction = extract_numbers_and_text_from_results(ocr_results)
-                extraction['preprocessing_method'] = method_name
-                all_ocr_results.append({
-                    'method': method_name,
-                    'results': ocr_results,
-                    'extraction': extraction
-                })
-                
-                # Track best overall result
-                if extraction['confidence'] > best_confidence:
-                    best_confidence = extraction['confidence']
-                    best_result = extraction
+        return jsonify(response)
+    
+    except Exception as e:
+        logger.error(f"OCR scan error: {e}", exc_info=True)
+        return jsonify({'error': str(e), 'success': False}), 500
+
+@app.route('/api/ocr/receipt', methods=['POST'])
+def ocr_receipt():
+    """Scan a whole receipt and return one item per line, ready for /api/items/bulk"""
+    try:
+        try:
+            image_bytes, options = read_scan_request()
+            date = options.get('date')
+            if date:
+                datetime.strptime(date, '%Y-%m-%d')
+        except ValueError as e:
+            return jsonify({'error': str(e), 'success': False}), 400
         
-        # Fallback if no good results
-        if not best_result or best_confidence == 0:
-            logger.warning("No meaningful OCR results found, trying basic extraction")
-            try:
-                basic_text = pytesseract.image_to_string(Image.fromarray(processed_images[0][1]))
-                best_result = extract_numbers_and_text_from_text(basic_text)
-                best_result['preprocessing_method'] = 'fallback'
-                best_result['config'] = 'basic'
-                best_result['raw_text'] = basic_text
-            except Exception as e:
-                logger.error(f"Fallback OCR failed: {e}")
-                best_result = {
-                    'item_name': '',
-                    'price': '',
-                    'quantity': '',
-                    'total': '',
-                    'confidence': 0,
-                    'preprocessing_method': 'failed',
-                    'config': 'none',
-                    'raw_text': ''
-                }
+        try:
+            opencv_image, image_size = decode_image_bytes(image_bytes)
+        except Exception as e:
+            logger.error(f"Image decoding error: {e}")
+            return jsonify({'error': f'Invalid image data: {str(e)}', 'success': False}), 400
         
-        response = {
-            'success': True,
-            'extracted': {
-                'item_name': best_result.get('item_name', ''),
-                'price': best_result.get('price', ''),
-                'quantity': best_result.get('quantity', ''),
-                'total': best_result.get('total', '')
-            },
-            'confidence': best_result.get('confidence', 0),
-            'method_used': best_result.get('preprocessing_method', 'unknown'),
-            'config_used': best_result.get('config', 'unknown'),
-            'raw_text': best_result.get('raw_text', ''),
-            'debug_info': {
-                'methods_tried': len(processed_images),
-                'total_extractions': len(all_ocr_results),
-                'best_confidence': best_confidence
-            }
-        }
+        response = scan_receipt(opencv_image, date=date, category=options.get('category', 'other'))
+        response['image_size'] = image_size
+        return jsonify(response)
+    except Exception as e:
+        logger.error(f"Receipt scan error: {e}", exc_info=True)
+        return jsonify({'error': str(e), 'success': False}), 500
 
-        print("000000000000")
-        print(response)
+@app.route('/api/ocr/jobs', methods=['POST'])
+def create_ocr_job():
+    """Queue an OCR scan and return a job id immediately"""
+    try:
+        try:
+            image_bytes, options = read_scan_request()
+            search = get_search_mode(options)
+            engine = get_engine(options)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'success': False}), 400
         
-        logger.info(f"OCR completed. Best confidence: {best_confidence}, Method: {best_result.get('preprocessing_method')}")
-        return jsonify(response)
+        try:
+            opencv_image, image_size = decode_image_bytes(image_bytes)
+        except Exception as e:
+            logger.error(f"Image decoding error: {e}")
+            return jsonify({'error': f'Invalid image data: {str(e)}', 'success': False}), 400
+        
+        try:
+            job_id = ocr_job_queue.submit(opencv_image, image_size, search=search, engine=engine)
+        except queue.Full:
+            retry_after = ocr_job_queue.retry_after()
+            response = jsonify({'error': 'OCR queue is full', 'success': False,
+                                'retry_after': retry_after})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 503
         
+        return jsonify({'success': True, 'job_id': job_id, 'status': 'queued',
+                        'status_url': f'/api/ocr/jobs/{job_id}'}), 202
     except Exception as e:
-        logger.error(f"OCR scan error: {e}", exc_info=True)
+        logger.error(f"OCR job error: {e}", exc_info=True)
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/api/ocr/jobs/<job_id>', methods=['GET'])
+def get_ocr_job(job_id):
+    """Get the status of a queued OCR scan, with its result once done"""
+    job = ocr_job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'success': False}), 404
+    return jsonify(job)
+
 @app.route('/api/daily-total/<date>', methods=['GET'])
 def get_daily_total(date):
     """Get total sales amount for a specific date"""
     try:
-        items = inventory_manager.get_items_by_date(date)
-        total = sum(item.get('totalAmount', 0) for item in items)
+        summary = inventory_manager.get_day_summary(date)
         return jsonify({
             'date': date,
-            'total': total,
-            'item_count': len(items)
+            'total': summary['total_sales'],
+            'item_count': summary['item_count']
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -486,12 +3372,10 @@ def get_daily_total(date):
 def get_stats():
     """Get overall statistics"""
     try:
-        total_days = len(inventory_manager.data)
-        total_items = sum(len(items) for items in inventory_manager.data.values())
-        total_sales = sum(
-            sum(item.get('totalAmount', 0) for item in items) 
-            for items in inventory_manager.data.values()
-        )
+        summary = inventory_manager.summarize()
+        total_days = summary['total_days']
+        total_items = summary['total_items']
+        total_sales = summary['total_sales']
         return jsonify({
             'total_days': total_days,
             'total_items': total_items,
@@ -501,13 +3385,51 @@ def get_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/categories', methods=['GET'])
+def get_category_stats():
+    """Get item count and sales per category over all retained days"""
+    try:
+        return jsonify({'categories': inventory_manager.get_category_totals()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats/categories/<date>', methods=['GET'])
+def get_daily_category_stats(date):
+    """Get item count and sales per category for a specific date"""
+    try:
+        summary = inventory_manager.get_day_summary(date)
+        return jsonify({'date': date, 'categories': summary['categories']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Totals, top items and per-category trend: ?from=&to=&period=day|month&category=&top=
+    
+    Covers archived days as well as the retained ones.
+    """
+    try:
+        try:
+            date_from, date_to = parse_date_param('from'), parse_date_param('to')
+            period = request.args.get('period', 'day')
+            if period not in ('day', 'month'):
+                raise ValueError(f'Unknown period: {period}')
+            top = int(request.args.get('top', ANALYTICS_TOP_ITEMS))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        result = inventory_manager.analytics(date_from, date_to, period,
+                                             request.args.get('category'), max(top, 0))
+        return jsonify({'from': date_from, 'to': date_to, **result})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/cleanup', methods=['POST'])
 def manual_cleanup():
     """Manually trigger data cleanup"""
     try:
-        old_count = sum(len(items) for items in inventory_manager.data.values())
+        old_count = inventory_manager.summarize()['total_items']
         inventory_manager.cleanup_old_data()
-        new_count = sum(len(items) for items in inventory_manager.data.values())
+        new_count = inventory_manager.summarize()['total_items']
         return jsonify({
             'success': True,
             'items_removed': old_count - new_count,
@@ -527,36 +3449,71 @@ def health_check():
         'myanmar_support': check_myanmar_support()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request counters and hot-path latency histograms in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 def check_tesseract_installation():
     """Check if Tesseract is properly installed"""
-    try:
-        version = pytesseract.get_tesseract_version()
-        return True
-    except:
-        return False
+    return tesseract_runtime.installed
 
 @app.route('/api/ocr/debug', methods=['GET'])
 def ocr_debug():
     """Debug endpoint to check OCR setup"""
     try:
-        info = {
-            'tesseract_installed': check_tesseract_installation(),
-            'tesseract_version': None,
-            'available_languages': [],
-            'myanmar_support': check_myanmar_support()
-        }
-        
-        try:
-            info['tesseract_version'] = str(pytesseract.get_tesseract_version())
-            info['available_languages'] = pytesseract.get_languages()
-        except Exception as e:
-            info['tesseract_error'] = str(e)
-        
+        info = tesseract_runtime.info()
+        if not info['tesseract_error']:
+            del info['tesseract_error']
+        info['default_engine'] = OCR_ENGINE
+        info['engines'] = {name: engine.info() for name, engine in OCR_ENGINES.items()}
         return jsonify(info)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ocr/runtime/refresh', methods=['POST'])
+def refresh_ocr_runtime():
+    """Re-probe Tesseract version and languages"""
+    try:
+        return jsonify({'success': True, **tesseract_runtime.refresh()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS):
+    """Serve the app with waitress: one process, `threads` request threads.
+    
+    OCR runs in Tesseract subprocesses on the shared executor, so threads
+    use every core without a second copy of the in-memory inventory.
+    """
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        sys.exit("waitress is not installed (pip install waitress)")
+    # Take the store lock before listening, so a second server fails right away
+    init_server()
+    logger.info(f"Serving on {host}:{port} with {threads} threads")
+    waitress_serve(app, host=host, port=port, threads=threads)
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        # python InventoryManager.py serve [threads]
+        serve(threads=int(sys.argv[2]) if len(sys.argv) > 2 else SERVER_THREADS)
+        sys.exit(0)
+    
+    if len(sys.argv) > 1 and sys.argv[1] in ('migrate-sqlite', 'migrate-partitioned'):
+        # python InventoryManager.py migrate-sqlite [json_file] [db_file]
+        # python InventoryManager.py migrate-partitioned [json_file] [directory]
+        json_file = sys.argv[2] if len(sys.argv) > 2 else DATA_FILE
+        if sys.argv[1] == 'migrate-sqlite':
+            target = sys.argv[3] if len(sys.argv) > 3 else SQLITE_FILE
+            storage = SqliteStorage(target)
+        else:
+            target = sys.argv[3] if len(sys.argv) > 3 else PARTITION_DIR
+            storage = PartitionedStorage(target)
+        count = migrate_json(json_file, storage)
+        print(f"✓ Migrated {count} items from {json_file} to {target}")
+        sys.exit(0)
+    
     # Ensure data directory exists
     os.makedirs(os.path.dirname(os.path.abspath(DATA_FILE)), exist_ok=True)
     
@@ -566,9 +3523,8 @@ if __name__ == '__main__':
     # Check Tesseract installation
     if check_tesseract_installation():
         try:
-            version = pytesseract.get_tesseract_version()
-            print(f"✓ Tesseract version: {version}")
-            languages = pytesseract.get_languages()
+            print(f"✓ Tesseract version: {tesseract_runtime.version}")
+            languages = tesseract_runtime.languages
             print(f"✓ Available languages: {', '.join(languages)}")
             if 'mya' in languages:
                 print("✓ Myanmar language support available")
@@ -582,9 +3538,15 @@ if __name__ == '__main__':
         print("   macOS: brew install tesseract")
         print("   Windows: Download from GitHub releases")
     
-    print(f"✓ Data storage: {DATA_FILE}")
-    print(f"✓ Data retention: {RETENTION_DAYS} days")
+    storage_path = {'sqlite': SQLITE_FILE, 'partitioned': PARTITION_DIR}.get(STORAGE_BACKEND, DATA_FILE)
+    print(f"✓ Data storage: {storage_path} ({STORAGE_BACKEND})")
+    print(f"✓ Data retention: {RETENTION_DAYS} days (checked every {RETENTION_INTERVAL:g}s)")
+    print(f"✓ Archive: {ARCHIVE_DIR if ARCHIVE_ENABLED else 'disabled, expired days are deleted'}")
+    print(f"✓ OCR engine: {OCR_ENGINE}")
     print(f"✓ Debug endpoint: /api/ocr/debug")
+    print(f"✓ Production server: python InventoryManager.py serve")
     print("=" * 50)
     
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # The reloader's watcher process never serves requests, so only the child
+    # it starts opens the data store (on its first request)
+    app.run(debug=True, host=SERVER_HOST, port=SERVER_PORT)
\ No newline at end of file
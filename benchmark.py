@@ -0,0 +1,354 @@
+"""Reproducible benchmarks for the OCR pipeline and InventoryManager storage.
+
+Generates synthetic price labels with PIL (known names and prices, optional
+Myanmar text, noise, blur and rotation), runs them through the same pipeline
+as /api/ocr/scan, and drives InventoryManager with realistic day sizes. All
+results are printed (or written) as JSON so runs can be diffed.
+
+Usage:
+    python benchmark.py                      # OCR + storage, JSON to stdout
+    python benchmark.py --suite storage --output bench.json
+    python benchmark.py --suite ocr --images 20 --search adaptive exhaustive
+    python benchmark.py --suite ocr --engine tesseract easyocr vote
+    python benchmark.py --suite analytics --archive-months 24
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+ITEM_NAMES = ['Rice Bag', 'Cooking Oil', 'Sugar', 'Green Tea', 'Instant Noodles',
+              'Soap Bar', 'Eggs Tray', 'Fish Sauce', 'Condensed Milk', 'Salt']
+MYANMAR_NAMES = ['ဆန်', 'ဆီ', 'သကြား', 'လက်ဖက်', 'ဆား']
+CATEGORIES = ['food', 'drinks', 'household', 'other']
+
+FONT_PATHS = [
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/Library/Fonts/Arial.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf',
+]
+MYANMAR_FONT_PATHS = [
+    os.environ.get('BENCH_MYANMAR_FONT', ''),
+    '/usr/share/fonts/truetype/padauk/Padauk-Regular.ttf',
+    '/usr/share/fonts/truetype/noto/NotoSansMyanmar-Regular.ttf',
+    '/usr/share/fonts/noto/NotoSansMyanmar-Regular.ttf',
+]
+
+def load_font(paths, size):
+    for path in paths:
+        if path and os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return None
+
+def percentiles(samples):
+    """Latency summary in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    values = np.array(samples) * 1000
+    return {
+        'count': len(samples),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+def make_label(rng, myanmar_font=None):
+    """Draw one synthetic price label and return (BGR array, ground truth)"""
+    name = rng.choice(ITEM_NAMES)
+    price = rng.choice([250, 500, 1200, 1500, 2500, 3800, 4500, 12000])
+    quantity = rng.randint(2, 9)
+    total = price * quantity
+    font = load_font(FONT_PATHS, 36) or ImageFont.load_default()
+    
+    image = Image.new('L', (720, 360), 255)
+    draw = ImageDraw.Draw(image)
+    draw.text((40, 30), name, fill=0, font=font)
+    if myanmar_font is not None:
+        draw.text((420, 30), rng.choice(MYANMAR_NAMES), fill=0, font=myanmar_font)
+    draw.text((40, 110), f"Price {price}", fill=0, font=font)
+    draw.text((40, 180), f"Qty {quantity}", fill=0, font=font)
+    draw.text((40, 250), f"Total {total}", fill=0, font=font)
+    
+    # Camera-like distortions
+    image = image.rotate(rng.uniform(-4, 4), expand=True, fillcolor=255)
+    if rng.random() < 0.5:
+        image = image.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.2)))
+    pixels = np.asarray(image, dtype=np.float32)
+    pixels += np.random.default_rng(rng.randint(0, 2**31)).normal(0, rng.uniform(2, 12), pixels.shape)
+    gray = np.clip(pixels, 0, 255).astype(np.uint8)
+    bgr = np.repeat(gray[:, :, None], 3, axis=2)
+    
+    truth = {'item_name': name, 'price': price, 'quantity': quantity, 'total': total}
+    return bgr, truth
+
+def field_matches(extracted, truth):
+    """Which extracted fields match the ground truth"""
+    def number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return {
+        'item_name': truth['item_name'].lower() in str(extracted.get('item_name', '')).lower(),
+        'price': number(extracted.get('price')) == truth['price'],
+        'quantity': number(extracted.get('quantity')) == truth['quantity'],
+        'total': number(extracted.get('total')) == truth['total']
+    }
+
+def accuracy(matches):
+    if not matches:
+        return {}
+    fields = matches[0].keys()
+    summary = {field: round(sum(m[field] for m in matches) / len(matches), 3) for field in fields}
+    summary['all_fields'] = round(sum(all(m.values()) for m in matches) / len(matches), 3)
+    return summary
+
+def bench_ocr(im, count, search_modes, engines, seed):
+    rng = random.Random(seed)
+    if not im.check_tesseract_installation():
+        return {'skipped': 'Tesseract is not installed'}
+    myanmar_font = load_font(MYANMAR_FONT_PATHS, 36) if im.check_myanmar_support() else None
+    labels = [make_label(rng, myanmar_font) for _ in range(count)]
+    configs = im.get_tesseract_configs()
+    
+    # Every (method, config) pair on its own, timed serially
+    pair_latency, pair_matches = {}, {}
+    preprocessing = {}
+    for image, truth in labels:
+        pipeline = im.PreprocessingPipeline(image)
+        for method in pipeline:
+            variant = pipeline[method]
+            for config in configs:
+                started = time.perf_counter()
+                try:
+                    text = im.run_tesseract(variant, config)
+                except Exception:
+                    text = ''
+                elapsed = time.perf_counter() - started
+                key = f"{method}|{config}"
+                pair_latency.setdefault(key, []).append(elapsed)
+                extraction = im.extract_numbers_and_text_from_text(text)
+                pair_matches.setdefault(key, []).append(field_matches(extraction, truth))
+        for stage, ms in pipeline.timings.items():
+            preprocessing.setdefault(stage, []).append(ms / 1000)
+    
+    by_pair = {}
+    for key in pair_latency:
+        method, config = key.split('|', 1)
+        by_pair[key] = {'preprocessing_method': method, 'config': config,
+                        'latency': percentiles(pair_latency[key]),
+                        'accuracy': accuracy(pair_matches[key])}
+    
+    # End-to-end scans as served by /api/ocr/scan
+    scans = {}
+    for engine in engines:
+        for mode in search_modes:
+            latencies, matches, tried = [], [], []
+            started = time.perf_counter()
+            for image, truth in labels:
+                scan_started = time.perf_counter()
+                response = im.scan_image(image, search=mode, engine=engine)
+                latencies.append(time.perf_counter() - scan_started)
+                matches.append(field_matches(response['extracted'], truth))
+                tried.append(response['debug_info'].get('combinations_tried', 0))
+            wall = time.perf_counter() - started
+            scans[f"{engine}|{mode}"] = {
+                'latency': percentiles(latencies),
+                'throughput_per_s': round(len(labels) / wall, 3) if wall else None,
+                'accuracy': accuracy(matches),
+                'mean_combinations_tried': round(sum(tried) / len(tried), 2)
+            }
+    
+    return {
+        'images': count,
+        'myanmar_text': myanmar_font is not None,
+        'configs': configs,
+        'preprocessing': {stage: percentiles(s) for stage, s in preprocessing.items()},
+        'by_method_config': by_pair,
+        'scan': scans
+    }
+
+def bench_storage(im, backends, days, items_per_day, operations, seed, workdir):
+    rng = random.Random(seed)
+    today = datetime.now()
+    dates = [(today - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+    
+    def make_item(date):
+        price = rng.choice([250, 500, 1200, 1500, 2500])
+        units = rng.randint(1, 10)
+        return date, {'name': rng.choice(ITEM_NAMES), 'price': price, 'unitsSold': units,
+                      'totalAmount': price * units, 'category': rng.choice(CATEGORIES),
+                      'unit': 'pcs', 'date': date}
+    
+    def open_manager(backend, directory):
+        data_file = os.path.join(directory, 'inventory_data.json')
+        if backend == 'sqlite':
+            storage = im.SqliteStorage(os.path.join(directory, 'inventory_data.db'))
+        elif backend == 'partitioned':
+            storage = im.PartitionedStorage(os.path.join(directory, 'partitions'))
+        elif backend == 'journal':
+            storage = im.JournalStorage(data_file)
+        else:
+            storage = im.JsonFileStorage(data_file)
+        return im.InventoryManager(data_file, storage)
+    
+    results = {}
+    for backend in backends:
+        directory = os.path.join(workdir, f'storage-{backend}')
+        os.makedirs(directory)
+        manager = open_manager(backend, directory)
+        started = time.perf_counter()
+        manager.add_items([make_item(date) for date in dates for _ in range(items_per_day)])
+        prefill = time.perf_counter() - started
+        manager.close()
+        
+        started = time.perf_counter()
+        manager = open_manager(backend, directory)
+        startup = time.perf_counter() - started
+        
+        timings = {name: [] for name in ('add', 'update', 'delete', 'read_day', 'stats')}
+        ids = []
+        for _ in range(operations):
+            date, item = make_item(rng.choice(dates[:3]))
+            started = time.perf_counter()
+            ids.append((date, manager.add_item(date, item)['id']))
+            timings['add'].append(time.perf_counter() - started)
+        for date, item_id in rng.sample(ids, len(ids) // 2):
+            started = time.perf_counter()
+            manager.update_item(date, item_id, {'unitsSold': 3, 'totalAmount': 900})
+            timings['update'].append(time.perf_counter() - started)
+        for date, item_id in rng.sample(ids, len(ids) // 2):
+            started = time.perf_counter()
+            manager.delete_item(date, item_id)
+            timings['delete'].append(time.perf_counter() - started)
+        for _ in range(operations):
+            started = time.perf_counter()
+            manager.get_items_by_date(rng.choice(dates))
+            timings['read_day'].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            manager.summarize()
+            timings['stats'].append(time.perf_counter() - started)
+        manager.close()
+        
+        results[backend] = {
+            'prefill_s': round(prefill, 3),
+            'startup_ms': round(startup * 1000, 3),
+            **{name: percentiles(samples) for name, samples in timings.items()}
+        }
+    
+    return {'days': days, 'items_per_day': items_per_day, 'operations': operations,
+            'backends': results}
+
+def bench_analytics(im, months, items_per_day, operations, seed, workdir):
+    """Archive `months` of synthetic days, then time /api/analytics reductions over them"""
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=im.RETENTION_DAYS + 1)
+    dates = [(start - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(months * 30)]
+    names = [f"{name} {size}" for name in ITEM_NAMES for size in ('S', 'M', 'L')]
+    
+    def make_item():
+        price = rng.choice([250, 500, 1200, 1500, 2500])
+        units = rng.randint(1, 10)
+        return {'name': rng.choice(names), 'price': price, 'unitsSold': units,
+                'totalAmount': price * units, 'category': rng.choice(CATEGORIES)}
+    
+    directory = os.path.join(workdir, 'analytics')
+    os.makedirs(directory)
+    archive = im.ColumnarArchive(os.path.join(directory, 'archive'))
+    days = {date: [make_item() for _ in range(items_per_day)] for date in dates}
+    started = time.perf_counter()
+    archive.append(days)
+    append = time.perf_counter() - started
+    
+    data_file = os.path.join(directory, 'inventory_data.json')
+    manager = im.InventoryManager(data_file, im.JsonFileStorage(data_file), archive)
+    queries = {
+        'all_by_month': (None, None, 'month'),
+        'all_by_day': (None, None, 'day'),
+        'last_quarter_by_day': (dates[min(89, len(dates) - 1)], None, 'day')
+    }
+    timings = {}
+    for name, (date_from, date_to, period) in queries.items():
+        # The first query also decodes the month files; later ones hit the month cache
+        archive._cache.clear()
+        started = time.perf_counter()
+        manager.analytics(date_from, date_to, period)
+        cold = time.perf_counter() - started
+        samples = []
+        for _ in range(operations):
+            started = time.perf_counter()
+            manager.analytics(date_from, date_to, period)
+            samples.append(time.perf_counter() - started)
+        timings[name] = {'cold_ms': round(cold * 1000, 3), 'warm': percentiles(samples)}
+    manager.close()
+    
+    return {
+        'months': months,
+        'items': len(dates) * items_per_day,
+        'append_s': round(append, 3),
+        'archive_bytes': archive.size(),
+        'queries': timings
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--suite', choices=['all', 'ocr', 'storage', 'analytics'], default='all')
+    parser.add_argument('--images', type=int, default=10, help='synthetic labels for the OCR suite')
+    parser.add_argument('--search', nargs='+', default=['exhaustive', 'adaptive', 'layout'],
+                        choices=['exhaustive', 'adaptive', 'layout'])
+    parser.add_argument('--engine', nargs='+', default=['tesseract'],
+                        choices=['tesseract', 'easyocr', 'vote'])
+    parser.add_argument('--backends', nargs='+', default=['json', 'journal', 'sqlite', 'partitioned'],
+                        choices=['json', 'journal', 'sqlite', 'partitioned'])
+    parser.add_argument('--days', type=int, default=30, help='retained days to prefill')
+    parser.add_argument('--items-per-day', type=int, default=200)
+    parser.add_argument('--operations', type=int, default=200, help='timed operations per kind')
+    parser.add_argument('--archive-months', type=int, default=12, help='archived months for the analytics suite')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='daybunce-bench-')
+    # The module creates its data, stats and cache files in the working
+    # directory on import, so keep the benchmark away from real data
+    os.environ.setdefault('OCR_CACHE_ENABLED', '0')
+    os.environ.setdefault('RETENTION_INTERVAL', '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import InventoryManager as im
+    
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'seed': args.seed,
+        'cpu_count': os.cpu_count(),
+        'tesseract_version': im.tesseract_runtime.version,
+        'ocr_executor': {'kind': im.OCR_EXECUTOR, 'max_workers': im.ocr_executor.max_workers}
+    }
+    if args.suite in ('all', 'ocr'):
+        report['ocr'] = bench_ocr(im, args.images, args.search, args.engine, args.seed)
+    if args.suite in ('all', 'storage'):
+        report['storage'] = bench_storage(im, args.backends, args.days, args.items_per_day,
+                                          args.operations, args.seed, workdir)
+    if args.suite in ('all', 'analytics'):
+        report['analytics'] = bench_analytics(im, args.archive_months, args.items_per_day,
+                                              max(args.operations // 10, 1), args.seed, workdir)
+    
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()